@@ -0,0 +1,181 @@
+"""
+OCR Benchmark - Speed and accuracy of the plate OCR on the debug_capture corpus
+- Every *_det.jpg in debug_capture/ is a plate crop whose file name carries the plate text.
+- Runs one or more OCR configurations (preprocessing variant, allowlist, batch size,
+  CRAFT detector on/off) through the same LPProcessor code the live app uses.
+- Reports crops/second, per-crop latency percentiles, exact-match rate and character error rate.
+- Writes a JSON report so OCR changes can be accepted or rejected on numbers.
+
+The file names hold what the app read at the time, so a few labels may be wrong; pass
+--labels with a JSON {"<file name>": "<plate>"} to correct them.
+
+Usage:
+    python benchmark_ocr.py
+    python benchmark_ocr.py --variants default clahe gray --batch 1 8 --detector skip full
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+
+# Load the app without camera, MQTT or debug writes
+os.environ.setdefault('CAMERA_ENABLED', 'False')
+os.environ.setdefault('MQTT_ENABLED', '0')
+os.environ.setdefault('DEBUG_SAVE', 'False')
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from plate_capture_easyocr_upload import CONFIG, DebugCatalog, processor
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PERCENTILES = (50, 90, 99)
+
+
+def _gray(pil_img):
+    return cv2.cvtColor(np.array(pil_img.convert("RGB")), cv2.COLOR_RGB2GRAY)
+
+
+def _clahe(pil_img):
+    return cv2.createCLAHE(clipLimit=2.0, tileGridSize=(4, 4)).apply(_gray(pil_img))
+
+
+# Preprocessing variants: PIL crop -> 2D uint8 image for the recognizer
+VARIANTS = {
+    "default": processor.preprocess_plate,  # CLAHE + blur + adaptive threshold (what the app uses)
+    "clahe": _clahe,
+    "gray": _gray,
+}
+
+
+def load_corpus(directory, labels_file=None):
+    """[(file name, plate text, PIL crop)] for every det crop in `directory`."""
+    labels = {}
+    if labels_file:
+        with open(labels_file) as f:
+            labels = json.load(f)
+
+    corpus = []
+    for filename in sorted(os.listdir(directory)):
+        parsed = DebugCatalog._parse(filename)
+        if parsed is None or parsed[3] != 'det':
+            continue
+        plate = labels.get(filename, parsed[1]).upper()
+        corpus.append((filename, plate, Image.open(os.path.join(directory, filename)).convert("RGB")))
+    return corpus
+
+
+def edit_distance(a, b):
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return prev[-1]
+
+
+def summarize(samples_ms):
+    samples = np.asarray(samples_ms, dtype=np.float64)
+    summary = {"mean": round(float(samples.mean()), 3)}
+    for p in PERCENTILES:
+        summary[f"p{p}"] = round(float(np.percentile(samples, p)), 3)
+    summary["max"] = round(float(samples.max()), 3)
+    return summary
+
+
+def run_config(corpus, variant, batch_size, skip_detector, allowlist, repeat):
+    CONFIG['OCR_SKIP_DETECTOR'] = skip_detector
+    CONFIG['OCR_ALLOWLIST'] = allowlist
+    preprocess = VARIANTS[variant]
+
+    # Warm-up (model weights, allocator) is not measured
+    processor.recognize_batch([preprocess(img) for _, _, img in corpus[:batch_size]])
+
+    latencies, predictions = [], []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        predictions = []
+        for i in range(0, len(corpus), batch_size):
+            chunk = corpus[i:i + batch_size]
+            t0 = time.perf_counter()
+            results = processor.recognize_batch([preprocess(img) for _, _, img in chunk])
+            per_crop = (time.perf_counter() - t0) * 1000 / len(chunk)
+            latencies.extend([per_crop] * len(chunk))
+            predictions.extend(text for text, _ in results)
+    wall = time.perf_counter() - start
+
+    exact = sum(pred == plate for pred, (_, plate, _) in zip(predictions, corpus))
+    errors = sum(edit_distance(pred, plate) for pred, (_, plate, _) in zip(predictions, corpus))
+    chars = sum(len(plate) for _, plate, _ in corpus)
+    misses = [{"file": f, "truth": plate, "read": pred}
+              for pred, (f, plate, _) in zip(predictions, corpus) if pred != plate]
+
+    return {
+        "variant": variant,
+        "batch": batch_size,
+        "detector": "skip" if skip_detector else "full",
+        "allowlist": allowlist,
+        "crops": len(corpus) * repeat,
+        "crops_per_second": round(len(corpus) * repeat / wall, 2),
+        "latency_ms": summarize(latencies),
+        "exact_match_rate": round(exact / len(corpus), 4),
+        "character_error_rate": round(errors / max(1, chars), 4),
+        "misses": misses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark plate OCR speed and accuracy on debug_capture crops")
+    parser.add_argument("--corpus", default=os.path.join(BASE_DIR, "debug_capture"))
+    parser.add_argument("--labels", default=None, help="JSON {file name: plate} overriding file-name labels")
+    parser.add_argument("--variants", nargs="+", default=["default"], choices=sorted(VARIANTS))
+    parser.add_argument("--batch", nargs="+", type=int, default=[1, 8], help="crops per recognize_batch() call (only batched on GPU)")
+    parser.add_argument("--detector", nargs="+", default=["skip"], choices=["skip", "full"],
+                        help="skip: recognize YOLO crops directly; full: EasyOCR text detector + recognizer")
+    parser.add_argument("--allowlist", nargs="+", default=[CONFIG['OCR_ALLOWLIST']])
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", default=None, help="JSON report path (default: bench_results/<timestamp>.json)")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus, args.labels)
+    if not corpus:
+        print(f"⚠️ No *_det.jpg crops found in {args.corpus}")
+        return
+    print(f"📚 {len(corpus)} labeled crops from {args.corpus}")
+
+    # Importing the app loads nothing; run_config does its own warm-up
+    processor.load_models(warmup=False)
+
+    runs = []
+    for variant in args.variants:
+        for detector in args.detector:
+            for allowlist in args.allowlist:
+                for batch_size in args.batch:
+                    res = run_config(corpus, variant, max(1, batch_size), detector == "skip", allowlist,
+                                     max(1, args.repeat))
+                    runs.append(res)
+                    lat = res["latency_ms"]
+                    print(f"   {variant:<8} detector={res['detector']:<4} batch={res['batch']:<3} "
+                          f"{res['crops_per_second']:>8.1f} crops/s  p50={lat['p50']:.1f}ms p99={lat['p99']:.1f}ms  "
+                          f"exact={res['exact_match_rate']:.1%}  CER={res['character_error_rate']:.1%}")
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "corpus": os.path.abspath(args.corpus),
+        "crops": len(corpus),
+        "ocr_gpu": CONFIG['OCR_GPU'],
+        "runs": runs,
+    }
+    output = args.output or os.path.join(BASE_DIR, "bench_results",
+                                         f"ocr_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"📝 Report written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,8 @@
 License Plate Capture - Stable OCR (EasyOCR) + MQTT
 - YOLOv8 + EasyOCR + Stabilized Detection + MQTT
 - Designed for consistent and accurate plate recognition
+- YOLO and EasyOCR are created on first use and MQTT connects in the background at startup,
+  so importing this module is cheap and the camera loop never waits on the broker
 """
 
 import cv2
@@ -12,11 +14,8 @@ import threading
 from io import BytesIO
 from datetime import datetime, timezone
 import numpy as np
-from ultralytics import YOLO
 from PIL import Image
-import paho.mqtt.client as mqtt
 import os
-import easyocr
 from typing import List, Dict, Any
 
 # ========== CONFIGURATION ==========
@@ -34,13 +33,11 @@ MQTT_TOPIC = "test/parking/licenseplate"
 
 # OCR (EasyOCR)
 OCR_LANGS = ['en']  # English/alphanumeric plates
-reader = easyocr.Reader(OCR_LANGS, gpu=False)
 
 # Image handling
 PUBLISH_IMAGE_BASE64 = True
 CROP_PAD = 0.08
 DEBUG_SAVE = True  # Save cropped plates for debugging
-os.makedirs("debug_capture", exist_ok=True)
 # ==================================
 
 
@@ -48,32 +45,65 @@ def now_iso():
     return datetime.now(timezone.utc).astimezone().isoformat()
 
 
-# --- MQTT Client ---
 # --- MQTT Client ---
 MQTT_ENABLED = os.getenv('MQTT_ENABLED', '1') != '0'
-if MQTT_ENABLED:
-    client = mqtt.Client()
-    try:
-        client.connect(MQTT_BROKER, MQTT_PORT, keepalive=60)
-        client.loop_start()
-    except Exception as e:
-        # Don't crash if broker unavailable in dev/test
-        print(f"⚠️ Could not connect to MQTT broker: {e}")
-        MQTT_ENABLED = False
-else:
-    client = None
-
-# Lazy-loaded YOLO model (for upload processing)
+client = None
+_client_lock = threading.Lock()
+
+
+def connect_mqtt():
+    """Creates and connects the MQTT client. Blocks on the network: call it through start_mqtt()."""
+    global client, MQTT_ENABLED
+    with _client_lock:
+        if client is not None or not MQTT_ENABLED:
+            return client
+        import paho.mqtt.client as mqtt
+        new_client = mqtt.Client()
+        try:
+            new_client.connect(MQTT_BROKER, MQTT_PORT, keepalive=60)
+            new_client.loop_start()
+        except Exception as e:
+            # Don't crash if broker unavailable in dev/test
+            print(f"⚠️ Could not connect to MQTT broker: {e}")
+            MQTT_ENABLED = False
+            return None
+        client = new_client
+    return client
+
+
+def start_mqtt():
+    """Connects to the broker on a background thread, so startup and the camera loop never wait for it."""
+    threading.Thread(target=connect_mqtt, daemon=True).start()
+
+
+def get_mqtt():
+    """Connected MQTT client; None if MQTT is disabled, unreachable or still connecting. Never connects."""
+    return client
+
+# Lazy-loaded models (shared by upload processing and the camera loop)
 _yolo_model = None
+_reader = None
+_model_lock = threading.Lock()
 
 
 def get_yolo():
     global _yolo_model
-    if _yolo_model is None:
-        _yolo_model = YOLO(YOLO_MODEL_PATH)
+    with _model_lock:
+        if _yolo_model is None:
+            from ultralytics import YOLO
+            _yolo_model = YOLO(YOLO_MODEL_PATH)
     return _yolo_model
 
 
+def get_reader():
+    global _reader
+    with _model_lock:
+        if _reader is None:
+            import easyocr
+            _reader = easyocr.Reader(OCR_LANGS, gpu=False)
+    return _reader
+
+
 def publish_event(event_type, plate_text, confidence, crop_img):
     payload = {
         "plate": plate_text,
@@ -87,21 +117,22 @@ def publish_event(event_type, plate_text, confidence, crop_img):
         b64 = base64.b64encode(buf.getvalue()).decode('utf-8')
         payload["image_base64"] = b64
 
-    if MQTT_ENABLED and client is not None:
+    mqtt_client = get_mqtt()
+    if mqtt_client is not None:
         try:
-            client.publish(MQTT_TOPIC, json.dumps(payload), qos=1)
+            mqtt_client.publish(MQTT_TOPIC, json.dumps(payload), qos=1)
             print(f"[MQTT] {event_type.upper()} - {plate_text} ({confidence:.2f})")
         except Exception as e:
             print(f"⚠️ Failed to publish MQTT: {e}")
     else:
-        # MQTT disabled; log to stdout for dev
+        # MQTT disabled or not connected (yet); log to stdout for dev
         print(f"[MQTT disabled] {event_type.upper()} - {plate_text} ({confidence:.2f})")
 
 
 # --- OCR with EasyOCR ---
 def run_ocr(pil_img):
     img_cv = np.array(pil_img.convert("RGB"))
-    results = reader.readtext(img_cv, detail=1, paragraph=False)
+    results = get_reader().readtext(img_cv, detail=1, paragraph=False)
 
     if not results:
         return ""
@@ -134,6 +165,7 @@ def save_debug_images(crop_pil, plate_text):
     - processed OCR image (grayscale, upscaled, filtered, thresholded)
     """
     ts = now_iso().replace(':', '-')
+    os.makedirs("debug_capture", exist_ok=True)
     det_path = os.path.join("debug_capture", f"{ts}_{plate_text}_det.jpg")
     ocr_path = os.path.join("debug_capture", f"{ts}_{plate_text}_ocr.jpg")
 
@@ -254,7 +286,7 @@ def detection_loop(display: bool = True, stream: bool = True):
     """
     global latest_frame_jpeg
     cap = cv2.VideoCapture(CAMERA_SOURCE)
-    yolo = YOLO(YOLO_MODEL_PATH)
+    yolo = get_yolo()
     frame_idx = 0
 
     print("🎥 Starting camera processor (headless=%s, stream=%s)" % (not display, stream))
@@ -336,6 +368,7 @@ def start_camera_in_thread(stream: bool = False, display: bool = False):
         print("Camera thread already running")
         return
     _camera_thread_stop.clear()
+    start_mqtt()
     _camera_thread = threading.Thread(target=detection_loop, kwargs={'display': display, 'stream': stream}, daemon=True)
     _camera_thread.start()
 
@@ -349,6 +382,7 @@ def stop_camera_thread():
 
 if __name__ == "__main__":
     print("🚗 YOLO License Plate MQTT started (EasyOCR Stable Mode)...")
+    start_mqtt()
     t = threading.Thread(target=exit_watcher, daemon=True)
     t.start()
     detection_loop()
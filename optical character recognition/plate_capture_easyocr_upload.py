@@ -3,6 +3,9 @@ AI License Plate Recognition (LPR) System - All-in-One File
 - Incorporates: FastAPI API, YOLOv8, EasyOCR (Optimized), Detection Stability, MQTT, and Web UI.
 - FIXES: Improved camera aspect ratio, enhanced OCR, corrected MQTT/Debug saving.
 - NEW: Modern Minimalist UI using Tailwind CSS and Debug Capture Gallery.
+- Importing this module is cheap: torch / ultralytics / EasyOCR / paho are imported, models
+  loaded (in parallel, with a warm-up pass), MQTT connected and the camera started only from
+  the app lifespan. /api/ready/ answers 503 until the models are ready.
 """
 import cv2
 import time
@@ -11,24 +14,44 @@ import json
 import threading
 import io
 import os
-import easyocr
+import sys
+import asyncio
+import bisect
+import heapq
+import queue
+import uuid
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict, deque, Counter
 import numpy as np
 from typing import List, Dict, Any
 from datetime import datetime, timezone
 from io import BytesIO
 from PIL import Image
-import paho.mqtt.client as mqtt
-from ultralytics import YOLO
 
 # FastAPI / API imports
 from fastapi import FastAPI, UploadFile, File, Response, Depends
-from fastapi.responses import HTMLResponse, StreamingResponse, JSONResponse, FileResponse
+from fastapi.responses import HTMLResponse, StreamingResponse, JSONResponse, FileResponse, PlainTextResponse
+from contextlib import asynccontextmanager
 from starlette.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
+
+# Metrics, the result cache, the artifact writer and the detector export helpers are shared with the
+# parking service (one implementation of each). The folder is appended, not prepended, so its module
+# names never shadow installed packages.
+SHARED_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "parking management"))
+if SHARED_DIR not in sys.path:
+    sys.path.append(SHARED_DIR)
+from metrics import Metrics
+from result_cache import ResultCache, file_version
+from stream_pipeline import ArtifactWriter
+from model_export import exported_path, load_detector
 
 # ========== CONFIGURATION (Adjust if needed) ==========
 CONFIG = {
     "YOLO_MODEL_PATH": "license_plate_detector.pt", 
     "CAMERA_SOURCE": int(os.getenv('CAMERA_SOURCE', 0)),
+    "CAMERA_ENABLED": os.getenv('CAMERA_ENABLED', 'True') == 'True',  # False: upload/API only (e.g. benchmarks)
     "CONFIDENCE_THRESHOLD": float(os.getenv('CONF_THRESH', 0.5)),
     "FRAME_SKIP": int(os.getenv('FRAME_SKIP', 5)),
     "STABILITY_COUNT": int(os.getenv('STABILITY_COUNT', 5)),
@@ -38,22 +61,657 @@ CONFIG = {
     "MQTT_TOPIC": os.getenv('MQTT_TOPIC', "test/parking/licenseplate"),
     "OCR_LANGS": ['en'], 
     "PUBLISH_IMAGE_BASE64": os.getenv('PUBLISH_IMAGE_BASE64', 'True') == 'True',
+    # How crops travel over MQTT: base64 (inline, default when PUBLISH_IMAGE_BASE64), binary (raw JPEG
+    # on <topic>/image/<event_id>), reference (URL of the debug capture) or none
+    "MQTT_IMAGE_MODE": os.getenv('MQTT_IMAGE_MODE', 'base64' if os.getenv('PUBLISH_IMAGE_BASE64', 'True') == 'True' else 'none'),
+    "MQTT_BATCH_SIZE": int(os.getenv('MQTT_BATCH_SIZE', 1)),  # >1 sends JSON arrays of events
+    "MQTT_BATCH_MS": float(os.getenv('MQTT_BATCH_MS', 200)),
+    "MQTT_QUEUE_SIZE": int(os.getenv('MQTT_QUEUE_SIZE', 1000)),
+    "MQTT_SPOOL_PATH": os.getenv('MQTT_SPOOL_PATH', "mqtt_spool.jsonl"),  # undelivered messages, replayed on reconnect
+    "MQTT_SPOOL_MB": float(os.getenv('MQTT_SPOOL_MB', 50)),
+    "MQTT_BACKOFF_MAX": float(os.getenv('MQTT_BACKOFF_MAX', 60)),
     "CROP_PAD": float(os.getenv('CROP_PAD', 0.08)),
     "DEBUG_SAVE": os.getenv('DEBUG_SAVE', 'True') == 'True',
     "OCR_GPU": os.getenv('OCR_GPU', 'False') == 'True',
+    # Skip EasyOCR's CRAFT text detector and recognize YOLO plate boxes directly
+    "OCR_SKIP_DETECTOR": os.getenv('OCR_SKIP_DETECTOR', 'True') == 'True',
+    "OCR_ALLOWLIST": os.getenv('OCR_ALLOWLIST', '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'),
     # Camera Resolution for Fixing Aspect Ratio
     "CAM_WIDTH": int(os.getenv('CAM_WIDTH', 1280)), 
     "CAM_HEIGHT": int(os.getenv('CAM_HEIGHT', 720)),
+    # Upload result cache (identical re-posted images skip YOLO + OCR)
+    "RESULT_CACHE_MB": float(os.getenv('RESULT_CACHE_MB', 64)),
+    "RESULT_CACHE_ENTRIES": int(os.getenv('RESULT_CACHE_ENTRIES', 1024)),
+    # Live feed tiers: name -> (max width in px or None for the camera resolution, JPEG quality).
+    # The dashboard gets the full feed; lower tiers are opt-in with /api/video_feed/?tier=low
+    "STREAM_TIERS": {"full": (None, 95), "high": (1280, 85), "medium": (854, 70), "low": (480, 50)},
+    "STREAM_DEFAULT_TIER": os.getenv('STREAM_DEFAULT_TIER', 'full'),
+    # Debug captures are written by a background writer; when its queue is full
+    # the policy (drop_oldest, drop_newest or block) decides what is lost
+    "WRITER_QUEUE_SIZE": int(os.getenv('WRITER_QUEUE_SIZE', 64)),
+    "WRITER_POLICY": os.getenv('WRITER_POLICY', 'drop_oldest'),
+    "WRITER_CLOSE_TIMEOUT": float(os.getenv('WRITER_CLOSE_TIMEOUT', 5.0)),  # seconds to flush debug images on shutdown
+    # Plate voting: the last VOTE_WINDOW readings of a track vote on its plate text, so OCR slips of one
+    # plate (MH20EE7602 / MH2OEE7602) count toward one entry; stored best crops are capped at PLATE_MEMORY_MB
+    "VOTE_WINDOW": int(os.getenv('VOTE_WINDOW', 15)),
+    "PLATE_MEMORY_MB": float(os.getenv('PLATE_MEMORY_MB', 32)),
+    # Box tracking between processed frames: a confirmed track is only re-read every TRACK_REVERIFY_FRAMES
+    # processed frames, or right away after a miss or a box jump; a re-read more than PLATE_MATCH_EDITS
+    # characters away from the confirmed plate means another plate took over the track
+    "TRACK_IOU": float(os.getenv('TRACK_IOU', 0.3)),
+    "TRACK_MAX_MISSED": int(os.getenv('TRACK_MAX_MISSED', 5)),
+    "TRACK_REVERIFY_FRAMES": int(os.getenv('TRACK_REVERIFY_FRAMES', 10)),
+    "PLATE_MATCH_EDITS": int(os.getenv('PLATE_MATCH_EDITS', 2)),
+    # Plate detector backend: pytorch (.pt), onnx or openvino; DETECTOR_INT8 picks the INT8 export.
+    # Exports are made with "parking management/model_export.py license_plate_detector.pt --backend ...";
+    # a missing export fails model loading (see /api/ready/) instead of silently using the .pt weights
+    "DETECTOR_BACKEND": os.getenv('DETECTOR_BACKEND', 'pytorch'),
+    "DETECTOR_INT8": os.getenv('DETECTOR_INT8', 'False') == 'True',
 }
 # ==========================================================
 
-if CONFIG['DEBUG_SAVE']:
-    os.makedirs("debug_capture", exist_ok=True)
-
 
 def now_iso():
     return datetime.now(timezone.utc).astimezone().isoformat()
 
+
+METRICS = Metrics("lpr")
+
+
+class FrameBroadcaster:
+    """Shares the latest annotated frame with every MJPEG viewer.
+
+    The camera thread publishes each raw frame with a sequence number; nothing is encoded
+    until a viewer asks for it. Frames are encoded once per (frame, tier) and the chunk is
+    shared by every viewer on that tier. Viewers await an asyncio event instead of polling,
+    only receive frames they have not sent yet, and a slow viewer skips to the newest one.
+    """
+
+    def __init__(self, tiers: dict, default_tier: str):
+        self.tiers = tiers
+        self.default_tier = default_tier if default_tier in tiers else next(iter(tiers))
+        self._latest = (0, None)  # (sequence number, BGR frame)
+        self._encoded = {tier: (0, None, None) for tier in tiers}  # tier -> (seq, jpeg, chunk)
+        self._tier_locks = {tier: threading.Lock() for tier in tiers}
+        self._loop = None
+        self._event = None
+        self.subscribers = 0
+        self.encodes = 0
+        self.skipped = 0  # frames a viewer never received because a newer one was ready
+
+    def publish(self, frame):
+        """Called from the camera thread for every new frame."""
+        self._latest = (self._latest[0] + 1, frame)
+        if self._loop is not None and self.subscribers:
+            self._loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        event, self._event = self._event, asyncio.Event()
+        event.set()
+
+    def encode(self, tier: str = None):
+        """(seq, jpeg, chunk) of the latest frame at `tier`, encoding it only on first request."""
+        tier = tier or self.default_tier
+        with self._tier_locks[tier]:
+            seq, frame = self._latest
+            cached = self._encoded[tier]
+            if frame is None or cached[0] == seq:
+                return cached
+
+            max_width, quality = self.tiers[tier]
+            h, w = frame.shape[:2]
+            with METRICS.timer("stream_encode"):
+                if max_width and w > max_width:
+                    frame = cv2.resize(frame, (max_width, int(h * max_width / w)), interpolation=cv2.INTER_AREA)
+                ret, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            if not ret:
+                return cached
+            jpeg = jpeg.tobytes()
+            chunk = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n'
+            self._encoded[tier] = (seq, jpeg, chunk)
+            self.encodes += 1
+            return self._encoded[tier]
+
+    async def stream(self, tier: str = None):
+        """Async generator of multipart chunks for one viewer."""
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            self._event = asyncio.Event()
+
+        last_seq = 0
+        self.subscribers += 1
+        try:
+            while True:
+                event = self._event
+                if self._latest[0] == last_seq:
+                    await event.wait()
+                    continue
+                seq, _, chunk = await asyncio.to_thread(self.encode, tier)
+                if chunk is None or seq == last_seq:
+                    await event.wait()
+                    continue
+                if last_seq:
+                    self.skipped += seq - last_seq - 1
+                last_seq = seq
+                yield chunk
+        finally:
+            self.subscribers -= 1
+
+class DebugCatalog:
+    """In-memory index of the det/ocr image pairs in the debug_capture folder.
+
+    Built once from the folder at startup and updated by add() whenever a capture is
+    saved, so listing never touches the disk. Entries are kept sorted by timestamp;
+    time ranges are resolved with bisect and plate prefixes are filtered inside that range.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.entries = {}  # "<ts>_<plate>_<tag>" -> {'timestamp', 'plate', 'tag', 'det', 'ocr'}
+        self.order = []    # sorted (ts, base_name)
+        self.rebuild()
+
+    @staticmethod
+    def _parse(filename):
+        """'<ts>_<plate>[_<tag>]_<det|ocr>.jpg' -> (ts, plate, tag, kind), or None for other files."""
+        if not filename.endswith(('.jpg', '.jpeg')):
+            return None
+        parts = filename.rsplit('.', 1)[0].split('_')
+        if len(parts) == 3:  # older captures were saved without a tag
+            parts.insert(2, '')
+        if len(parts) != 4 or parts[3] not in ('det', 'ocr'):
+            return None
+        return tuple(parts)
+
+    def rebuild(self):
+        with self.lock:
+            self.entries.clear()
+            self.order.clear()
+        if not os.path.isdir(self.directory):
+            return
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                self.add(entry.name)
+
+    def add(self, filename: str):
+        parsed = self._parse(filename)
+        if parsed is None:
+            return
+        ts, plate, tag, kind = parsed
+        base_name = f"{ts}_{plate}_{tag}" if tag else f"{ts}_{plate}"
+        with self.lock:
+            item = self.entries.get(base_name)
+            if item is None:
+                item = {'timestamp': ts, 'plate': plate, 'tag': tag, 'det': None, 'ocr': None}
+                self.entries[base_name] = item
+                bisect.insort(self.order, (ts, base_name))
+            item[kind] = filename
+
+    def query(self, limit: int = 10, offset: int = 0, plate: str = None, since: str = None, until: str = None):
+        """Complete det/ocr pairs, newest first. Returns (page, total matches).
+
+        `since`/`until` are ISO timestamp prefixes (e.g. 2025-11-11 or 2025-11-11T23:40), both inclusive.
+        """
+        since = since.replace(' ', 'T').replace(':', '-') if since else None
+        until = until.replace(' ', 'T').replace(':', '-') if until else None
+        plate = plate.upper() if plate else None
+
+        with self.lock:
+            lo = bisect.bisect_left(self.order, (since,)) if since else 0
+            # Any timestamp that starts with `until` sorts before until + '\uffff'
+            hi = bisect.bisect_right(self.order, (until + '\uffff',)) if until else len(self.order)
+
+            page, total = [], 0
+            for ts, base_name in reversed(self.order[lo:hi]):
+                item = self.entries[base_name]
+                if not (item['det'] and item['ocr']):
+                    continue
+                if plate and not item['plate'].startswith(plate):
+                    continue
+                if offset <= total < offset + limit:
+                    page.append({'det': item['det'], 'ocr': item['ocr'], 'plate': item['plate'],
+                                 'tag': item['tag'], 'timestamp': ts.replace('T', ' ')})
+                total += 1
+        return page, total
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries)
+
+class PlateVotes:
+    """Constant-memory text vote for one tracked plate: counters over the last `window` readings."""
+
+    __slots__ = ("window", "counts")
+
+    def __init__(self, window: int):
+        self.window = deque(maxlen=max(1, window))
+        self.counts = Counter()
+
+    def add(self, text):
+        if len(self.window) == self.window.maxlen:
+            oldest = self.window[0]
+            self.counts[oldest] -= 1
+            if not self.counts[oldest]:
+                del self.counts[oldest]
+        self.window.append(text)
+        self.counts[text] += 1
+
+    def winner(self):
+        return self.counts.most_common(1)[0][0]
+
+
+def decode_image(content: bytes):
+    with METRICS.timer("decode"):
+        nparr = np.frombuffer(content, np.uint8)
+        return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+
+def encode_jpeg(image, quality: int = 85) -> bytes:
+    """JPEG bytes of a PIL image or a gray/BGR array."""
+    with METRICS.timer("jpeg_encode"):
+        if isinstance(image, np.ndarray):
+            ret, buf = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            return buf.tobytes() if ret else b""
+        buf = BytesIO()
+        image.save(buf, format="JPEG", quality=quality)
+        return buf.getvalue()
+
+def plates_match(a: str, b: str, max_edits: int = 2) -> bool:
+    """Whether two readings are within `max_edits` character edits (OCR slips on one physical plate)."""
+    if abs(len(a) - len(b)) > max_edits:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1] <= max_edits
+
+
+class PlateTracker:
+    """Lightweight IoU/centroid tracker that gives every plate box a track id across processed frames.
+
+    Boxes are matched greedily to the previous frame's tracks by IoU (at least `iou_threshold`),
+    falling back to centroid distance under one box width for fast-moving plates. A track is
+    dropped after `max_missed` processed frames without a match. Once a track's plate is
+    confirmed it carries the plate text and the caller can skip OCR for it, but only until
+    needs_ocr() says otherwise: every `reverify_every` frames, and right away when the track
+    was missed or only matched by centroid (the box jumped), since a new plate may have taken
+    its place. Each track also keeps a PlateVotes over its last `vote_window` readings.
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_missed: int = 5, reverify_every: int = 10,
+                 vote_window: int = 15):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.reverify_every = max(1, reverify_every)
+        self.vote_window = vote_window
+        # id -> {"box": (x1, y1, x2, y2), "missed": int, "plate": str | None, "votes": PlateVotes,
+        #        "since_ocr": frames since the last reading, "verify": re-read on the next frame}
+        self.tracks = {}
+        self._next_id = 1
+
+    @staticmethod
+    def _iou(a, b):
+        ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+        iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+        inter = ix * iy
+        union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+        return inter / union if union > 0 else 0.0
+
+    @staticmethod
+    def _centroid_match(a, b):
+        dx = (a[0] + a[2] - b[0] - b[2]) / 2
+        dy = (a[1] + a[3] - b[1] - b[3]) / 2
+        return dx * dx + dy * dy < (a[2] - a[0]) ** 2
+
+    def update(self, boxes):
+        """Assigns a track id to every box (in order) and ages out unmatched tracks."""
+        pairs = []
+        for tid, track in self.tracks.items():
+            for i, box in enumerate(boxes):
+                iou = self._iou(track["box"], box)
+                if iou >= self.iou_threshold:
+                    pairs.append((iou, tid, i))
+                elif self._centroid_match(track["box"], box):
+                    pairs.append((0.0, tid, i))
+        pairs.sort(reverse=True)
+
+        ids = [None] * len(boxes)
+        matched = {}  # tid -> IoU of its match (0.0 for a centroid match)
+        for iou, tid, i in pairs:
+            if ids[i] is None and tid not in matched:
+                ids[i] = tid
+                matched[tid] = iou
+
+        for tid in list(self.tracks):
+            track = self.tracks[tid]
+            if tid in matched:
+                if track["missed"] or matched[tid] < self.iou_threshold:
+                    track["verify"] = True
+                track["missed"] = 0
+                track["since_ocr"] += 1
+            else:
+                self.tracks[tid]["missed"] += 1
+                if self.tracks[tid]["missed"] > self.max_missed:
+                    del self.tracks[tid]
+
+        for i, box in enumerate(boxes):
+            if ids[i] is None:
+                ids[i] = self._next_id
+                self.tracks[self._next_id] = {"box": box, "missed": 0, "plate": None, "since_ocr": 0, "verify": False,
+                                              "votes": PlateVotes(self.vote_window)}
+                self._next_id += 1
+            else:
+                self.tracks[ids[i]]["box"] = box
+        return ids
+
+    def plate(self, tid):
+        return self.tracks[tid]["plate"]
+
+    def needs_ocr(self, tid):
+        track = self.tracks[tid]
+        return track["plate"] is None or track["verify"] or track["since_ocr"] >= self.reverify_every
+
+    def confirm(self, tid, plate_text):
+        """Marks the track as just read as the confirmed `plate_text`."""
+        self.tracks[tid].update(plate=plate_text, since_ocr=0, verify=False)
+
+    def vote(self, tid, text):
+        """Adds a reading to the track's votes and returns the winning text."""
+        votes = self.tracks[tid]["votes"]
+        votes.add(text)
+        return votes.winner()
+
+    def release(self, tid, reset_votes: bool = False):
+        """Resume OCR for a track (e.g. its plate entry expired or was evicted).
+
+        reset_votes also forgets its readings, for when another plate took over the track.
+        """
+        self.tracks[tid]["plate"] = None
+        if reset_votes:
+            self.tracks[tid]["votes"] = PlateVotes(self.vote_window)
+
+@dataclass(frozen=True)
+class PlateEvent:
+    """Immutable plate event, created under the state lock and published by the publisher thread.
+
+    The crop images are already JPEG-encoded; the same bytes go to MQTT and to the debug save.
+    """
+    event: str
+    plate: str
+    confidence: float
+    timestamp: str
+    crop_jpeg: bytes = None
+    thresh_jpeg: bytes = None
+    debug_tag: str = None       # save debug images with this tag
+    dwell_seconds: float = None  # exit events only
+
+def paho_client():
+    import paho.mqtt.client as mqtt
+    return mqtt.Client()
+
+
+class MqttPublisher:
+    """Outbound MQTT queue with batching, reconnect with exponential backoff and an on-disk spool.
+
+    submit() never waits for the network. A worker thread connects (retrying with backoff up to
+    `backoff_max` seconds) and sends messages in submission order: a failed send is retried
+    first, then the spool is replayed, then the in-memory queue is sent.
+    While the broker is away, or when the queue would exceed `queue_size`, the whole queue is
+    moved to `spool_path` (JSON lines, bounded by `spool_bytes`) and new messages go in behind it,
+    so the spool always holds the oldest undelivered messages. stop() writes everything still
+    pending to the spool; it is replayed on the next start (at-least-once: a crash during a
+    replay can resend messages).
+
+    `client_factory` builds a paho-compatible client (connect, loop_start, is_connected and
+    publish returning an object with .rc); pass an in-process stand-in to run without a broker.
+    """
+
+    REPLAY_CHUNK = 100  # spool lines read per pass
+
+    def __init__(self, broker: str, port: int, topic: str, client_factory=None, qos: int = 1,
+                 batch_size: int = 1, batch_ms: float = 200, queue_size: int = 1000,
+                 spool_path: str = "mqtt_spool.jsonl", spool_bytes: int = 50 * 1024 * 1024,
+                 backoff_max: float = 60.0):
+        self.broker = broker
+        self.port = port
+        self.topic = topic
+        self.client_factory = client_factory or paho_client
+        self.qos = qos
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_ms / 1000.0
+        self.queue_size = max(1, queue_size)
+        self.spool_path = spool_path
+        self.spool_bytes = spool_bytes
+        self.backoff_max = backoff_max
+        self.client = None
+        self._loop_started = False
+        self._thread = None
+        # Send order: _retry, then spool lines from _spool_offset, then _items.
+        # _cond guards all three; network I/O always happens outside it.
+        self._items = deque()  # (topic, dict event | bytes)
+        self._retry = None  # (topic, bytes, events) of a batch whose send failed
+        self._cond = threading.Condition()
+        self._spool_offset = 0  # bytes of the spool file already replayed
+        self._spool_lines = 0  # lines still to replay
+        if os.path.exists(spool_path):
+            with open(spool_path, 'rb') as f:
+                self._spool_lines = sum(1 for _ in f)
+        self._stop = threading.Event()
+        self.published = 0
+        self.spooled = 0
+        self.replayed = 0
+        self.dropped = 0
+        self.reconnects = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Stops the worker and writes the retry batch, unreplayed spool and queue back to the spool, in order."""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        with self._cond:
+            remaining = [(topic, data) for topic, data, _ in self._read_spool(self._spool_lines)]
+            pending = ([self._retry[:2]] if self._retry else []) + remaining
+            pending += [self._serialize([item]) for item in self._items]
+            self._retry, self._items = None, deque()
+            if os.path.exists(self.spool_path):
+                os.remove(self.spool_path)
+            self._spool_offset = self._spool_lines = 0
+            self._spool(pending)
+
+    @property
+    def connected(self):
+        return self.client is not None and self.client.is_connected()
+
+    def submit(self, event: Dict[str, Any], image: bytes = None):
+        """Queue one event; `image` (JPEG bytes) is sent raw on <topic>/image/<event_id> first."""
+        messages = []
+        if image is not None:
+            messages.append((f"{self.topic}/image/{event['event_id']}", image))
+            event = dict(event, image_topic=messages[0][0])
+        messages.append((self.topic, event))
+        with self._cond:
+            if len(self._items) + len(messages) > self.queue_size:
+                # Queue full: move all of it to the spool and append behind it, keeping the order
+                self._spool([self._serialize([item]) for item in list(self._items) + messages])
+                self._items.clear()
+            else:
+                self._items.extend(messages)
+            self._cond.notify()
+
+    @staticmethod
+    def _serialize(batch):
+        """[(topic, event|bytes), ...] -> (topic, bytes). Several events become one JSON array."""
+        topic, data = batch[0]
+        if isinstance(data, bytes):
+            return topic, data
+        events = [d for _, d in batch]
+        return topic, json.dumps(events if len(events) > 1 else events[0]).encode('utf-8')
+
+    def _next_batch(self):
+        """Next batch from the queue, or None when it is empty or the spool must be replayed first."""
+        with self._cond:
+            if not self._items and not self._spool_lines:
+                self._cond.wait(0.5)
+            if not self._items or self._spool_lines:
+                return None
+            batch = [self._items.popleft()]
+            if isinstance(batch[0][1], bytes) or self.batch_size == 1:
+                return batch
+
+            deadline = time.time() + self.batch_wait
+            while len(batch) < self.batch_size and not self._stop.is_set():
+                if self._items and isinstance(self._items[0][1], dict):
+                    batch.append(self._items.popleft())
+                    continue
+                if self._items:  # next is an image; send what we have
+                    break
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return batch
+
+    def _ensure_connected(self):
+        if self.connected:
+            return True
+        try:
+            if self.client is None:
+                self.client = self.client_factory()
+            self.client.connect(self.broker, self.port, keepalive=60)
+            if not self._loop_started:
+                self.client.loop_start()
+                self._loop_started = True
+            for _ in range(50):  # wait for CONNACK
+                if self.client.is_connected():
+                    self.reconnects += 1
+                    print(f"✅ Connected to MQTT broker: {self.broker}")
+                    return True
+                time.sleep(0.1)
+        except Exception as e:
+            print(f"⚠️ Could not connect to MQTT broker: {e}")
+        return False
+
+    def _send(self, topic, data):
+        try:
+            return self.client.publish(topic, data, qos=self.qos).rc == 0
+        except Exception as e:
+            print(f"⚠️ Failed to publish MQTT: {e}")
+            return False
+
+    def _spool(self, messages):
+        """Appends (topic, bytes) messages to the spool file, dropping them once it is full. Caller holds _cond."""
+        if not messages:
+            return
+        size = os.path.getsize(self.spool_path) if os.path.exists(self.spool_path) else 0
+        with open(self.spool_path, 'ab') as f:
+            for topic, data in messages:
+                line = (json.dumps({"topic": topic, "payload": base64.b64encode(data).decode('ascii')}) + "\n").encode('ascii')
+                if size + len(line) > self.spool_bytes:
+                    self.dropped += 1
+                    continue
+                f.write(line)
+                size += len(line)
+                self.spooled += 1
+                self._spool_lines += 1
+
+    def _read_spool(self, limit):
+        """Up to `limit` unreplayed spool messages as [(topic, bytes, line length)]. Caller holds _cond."""
+        messages = []
+        if not self._spool_lines:
+            return messages
+        with open(self.spool_path, 'rb') as f:
+            f.seek(self._spool_offset)
+            for _ in range(min(limit, self._spool_lines)):
+                line = f.readline()
+                message = json.loads(line)
+                messages.append((message["topic"], base64.b64decode(message["payload"]), len(line)))
+        return messages
+
+    def _send_retry(self):
+        if self._retry is None:
+            return True
+        topic, data, events = self._retry
+        if not self._send(topic, data):
+            return False
+        self.published += events
+        self._retry = None
+        return True
+
+    def _replay_spool(self):
+        """Sends spooled messages in order. Returns False (keeping the unsent rest) if the broker drops again."""
+        replayed = 0
+        while True:
+            with self._cond:
+                if not self._spool_lines:
+                    # Fully replayed; nothing can be appended while we hold _cond
+                    if os.path.exists(self.spool_path):
+                        os.remove(self.spool_path)
+                    self._spool_offset = 0
+                    break
+                chunk = self._read_spool(self.REPLAY_CHUNK)
+            for topic, data, length in chunk:
+                if not self._send(topic, data):
+                    return False
+                with self._cond:
+                    self._spool_offset += length
+                    self._spool_lines -= 1
+                self.replayed += 1
+                replayed += 1
+        if replayed:
+            print(f"[MQTT] Replayed {replayed} spooled message(s)")
+        return True
+
+    def _drain_to_spool(self):
+        with self._cond:
+            self._spool([self._serialize([item]) for item in self._items])
+            self._items.clear()
+
+    def _run(self):
+        backoff = min(1.0, self.backoff_max)
+        while not self._stop.is_set():
+            if not self._ensure_connected() or not self._send_retry() or not self._replay_spool():
+                self._drain_to_spool()
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self.backoff_max)
+                continue
+            backoff = min(1.0, self.backoff_max)
+
+            batch = self._next_batch()
+            if batch is None:
+                continue
+            topic, data = self._serialize(batch)
+            if self._send(topic, data):
+                self.published += len(batch)
+            else:
+                # Older than anything spooled or queued since, so it goes out first
+                self._retry = (topic, data, len(batch))
+
+    def stats(self):
+        with self._cond:
+            queued = len(self._items)
+            spool_pending = self._spool_lines
+        return {
+            "connected": self.connected,
+            "queued": queued,
+            "spool_pending": spool_pending,
+            "retrying": self._retry is not None,
+            "published": self.published,
+            "spooled": self.spooled,
+            "replayed": self.replayed,
+            "dropped": self.dropped,
+            "reconnects": self.reconnects,
+        }
+
 # ==========================================================
 # ============== LPProcessor CLASS (Core Logic) ============
 # ==========================================================
@@ -62,66 +720,202 @@ class LPProcessor:
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         
-        # Load Models
-        print("Loading YOLO model...")
-        self.yolo = YOLO(self.config['YOLO_MODEL_PATH'])
-        print("Loading EasyOCR model...")
-        self.reader = easyocr.Reader(self.config['OCR_LANGS'], gpu=self.config['OCR_GPU'])
+        # Models are loaded by load_models() (from the app lifespan), not here
+        self.detector_path = exported_path(self.config['YOLO_MODEL_PATH'], self.config['DETECTOR_BACKEND'],
+                                           self.config['DETECTOR_INT8'])
+        self.yolo = None
+        self.reader = None
+        # Neither YOLO nor the EasyOCR reader is thread-safe: the camera thread and concurrent
+        # uploads (threadpool) take turns on them through detect() / recognize_batch()
+        self.model_lock = threading.Lock()
+        self.load_seconds = {}  # model name -> seconds to load
+        self.warmup_seconds = None  # first YOLO + EasyOCR inference, if load_models() warmed up
+        self.phase = "idle"  # idle -> loading -> warming_up -> ready, or failed: <error>
+        self.ready = threading.Event()
         
         # State Management
-        self.plates_seen = {}
+        self.plates_seen = OrderedDict()  # least recently seen first
+        self._crop_bytes = 0  # JPEG bytes of the best crops held in plates_seen
         self.confirmed_plates = set()
         self.recorded_plates = set()
         self.lock = threading.Lock()
+        # Expiry deadlines (last_seen + EXIT_TIMEOUT, plate). A plate can have stale entries (e.g. it was
+        # evicted and seen again); only the one matching its entry's "expires_at" counts, the rest are skipped.
+        # Shares self.lock so the exit watcher sleeps until the earliest deadline.
+        self._expiry_heap = []
+        self._expiry_cond = threading.Condition(self.lock)
         
-        # MQTT Setup
-        self.client = None
+        # MQTT Setup (connected in start())
+        self.mqtt = None
         self.mqtt_enabled = os.getenv('MQTT_ENABLED', '1') != '0'
-        if self.mqtt_enabled:
-            self._connect_mqtt()
             
-        # Video Stream State
-        self.latest_frame_jpeg = None
+        # Video Stream State (catalog and writer are created in start())
+        self.broadcaster = FrameBroadcaster(config['STREAM_TIERS'], config['STREAM_DEFAULT_TIER'])
+        self.debug_catalog = None
+        self.writer = None
+        self._started = False
+        self.tracker = PlateTracker(config['TRACK_IOU'], config['TRACK_MAX_MISSED'], config['TRACK_REVERIFY_FRAMES'],
+                                    config['VOTE_WINDOW'])
+        self.ocr_skipped = 0  # boxes of confirmed tracks that were followed without OCR
         self._camera_thread = None
         self._camera_thread_stop = threading.Event()
         
-        # Start background watchers
+        # Events are published (base64, JSON, MQTT, debug save) off the detection thread
+        self.events = queue.Queue()
+
+        METRICS.set("events_queue_depth", self.events.qsize, "Plate events waiting to be published")
+        METRICS.set("writer_queue_depth", lambda: self.writer.stats()["queued"], "Debug images waiting to be written")
+        METRICS.set("writer_dropped", lambda: self.writer.stats()["dropped"], "Debug images dropped by the writer policy")
+        METRICS.set("mqtt_queue_depth", lambda: self.mqtt.stats()["queued"] if self.mqtt else 0, "MQTT messages waiting to be sent")
+        METRICS.set("stream_skipped_frames", lambda: self.broadcaster.skipped, "Live-feed frames skipped by slow viewers")
+        METRICS.set("ocr_skipped", lambda: self.ocr_skipped, "Boxes of confirmed tracks followed without OCR")
+
+    def start(self):
+        """Debug catalog, writer, MQTT and the background watchers. Safe to call twice."""
+        if self._started: return
+        self._started = True
+        if self.config['DEBUG_SAVE']:
+            os.makedirs("debug_capture", exist_ok=True)
+        self.debug_catalog = DebugCatalog("debug_capture")
+        self.writer = ArtifactWriter(self.config['WRITER_QUEUE_SIZE'], self.config['WRITER_POLICY'])
+        if self.mqtt_enabled:
+            self._connect_mqtt()
+
         threading.Thread(target=self._exit_watcher, daemon=True).start()
+        threading.Thread(target=self._publisher_loop, daemon=True).start()
 
-    def _connect_mqtt(self):
+    def stop(self):
+        self._camera_thread_stop.set()
+        if self._camera_thread:
+            self._camera_thread.join(timeout=2.0)
+        # Publish what is still queued and let the writer finish those debug captures
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                self._publish(event)
+            except Exception as e:
+                print(f"⚠️ Failed to publish {event.event} for {event.plate}: {e}")
+        if self.writer is not None:
+            self.writer.close(self.config['WRITER_CLOSE_TIMEOUT'])
+        if self.mqtt is not None:
+            self.mqtt.stop()
+
+    def _load_yolo(self):
+        start = time.perf_counter()
+        # Exported ONNX / OpenVINO graphs return the same Results objects as the .pt model
+        model = load_detector(self.config['YOLO_MODEL_PATH'], self.config['DETECTOR_BACKEND'],
+                              self.config['DETECTOR_INT8'], export_missing=False)
+        return model, time.perf_counter() - start
+
+    def _load_reader(self):
+        import easyocr
+        start = time.perf_counter()
+        reader = easyocr.Reader(self.config['OCR_LANGS'], gpu=self.config['OCR_GPU'])
+        return reader, time.perf_counter() - start
+
+    def load_models(self, warmup: bool = True):
+        """Loads YOLO and EasyOCR side by side, runs one warm-up inference each, then sets `ready`."""
+        if self.ready.is_set(): return
         try:
-            self.client = mqtt.Client()
-            self.client.connect(self.config['MQTT_BROKER'], self.config['MQTT_PORT'], keepalive=60)
-            self.client.loop_start()
-            print(f"✅ Connected to MQTT broker: {self.config['MQTT_BROKER']}")
+            self.phase = "loading"
+            print("Loading YOLO and EasyOCR models...")
+            # Both loaders need torch; import it once here instead of in both threads at the same time
+            import torch  # noqa: F401
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                yolo, reader = pool.submit(self._load_yolo), pool.submit(self._load_reader)
+                self.yolo, self.load_seconds["yolo"] = yolo.result()
+                self.reader, self.load_seconds["easyocr"] = reader.result()
+
+            if warmup:
+                # First inference pays for lazy init (allocator, graph optimisation); keep it off the first request
+                self.phase = "warming_up"
+                start = time.perf_counter()
+                blank = np.zeros((self.config['CAM_HEIGHT'], self.config['CAM_WIDTH'], 3), dtype=np.uint8)
+                self.detect(blank)
+                self.recognize_batch([np.zeros((40, 160), dtype=np.uint8)])
+                self.warmup_seconds = time.perf_counter() - start
         except Exception as e:
-            print(f"⚠️ Could not connect to MQTT broker: {e}")
-            self.mqtt_enabled = False
-            self.client = None
+            self.phase = f"failed: {e}"
+            print(f"❌ Model loading failed: {e}")
+            raise
+
+        for name, seconds in self.load_seconds.items():
+            METRICS.set(f"{name}_load_seconds", seconds, f"Time to load the {name} model")
+        timings = [f'{k} {v:.1f}s' for k, v in self.load_seconds.items()]
+        if self.warmup_seconds is not None:
+            METRICS.set("warmup_seconds", self.warmup_seconds, "Time of the first (warm-up) YOLO and EasyOCR inference")
+            timings.append(f"warmup {self.warmup_seconds:.1f}s")
+        self.phase = "ready"
+        self.ready.set()
+        print(f"✅ Models ready ({', '.join(timings)})")
+
+    def boot(self, camera: bool):
+        """Background startup: load the models, then start the camera if enabled."""
+        try:
+            self.load_models()
+        except Exception:
+            return
+        if camera:
+            self.start_camera_in_thread(stream=True)
+
+    def _connect_mqtt(self, client_factory=None):
+        """Starts the MQTT publisher; it keeps retrying in the background if the broker is down."""
+        self.mqtt = MqttPublisher(self.config['MQTT_BROKER'], self.config['MQTT_PORT'], self.config['MQTT_TOPIC'],
+                                  client_factory=client_factory,
+                                  batch_size=self.config['MQTT_BATCH_SIZE'], batch_ms=self.config['MQTT_BATCH_MS'],
+                                  queue_size=self.config['MQTT_QUEUE_SIZE'], spool_path=self.config['MQTT_SPOOL_PATH'],
+                                  spool_bytes=int(self.config['MQTT_SPOOL_MB'] * 1024 * 1024),
+                                  backoff_max=self.config['MQTT_BACKOFF_MAX'])
+        self.mqtt.start()
+
+    def publish_event(self, event: PlateEvent):
+        """Queues an event for the publisher thread; never blocks the caller."""
+        self.events.put(event)
+
+    def _publisher_loop(self):
+        while True:
+            event = self.events.get()
+            try:
+                with METRICS.timer("publish"):
+                    self._publish(event)
+            except Exception as e:
+                print(f"⚠️ Failed to publish {event.event} for {event.plate}: {e}")
+
+    def _publish(self, event: PlateEvent):
+        debug_file = None
+        if event.debug_tag and self.config['DEBUG_SAVE'] and event.crop_jpeg is not None:
+            debug_file = self._save_debug_images(event.plate, event.crop_jpeg, event.thresh_jpeg, tag=event.debug_tag)
 
-    def publish_event(self, event_type, plate_text, confidence, crop_img):
         payload = {
-            "plate": plate_text,
-            "event": event_type,
-            "confidence": float(confidence),
-            "timestamp": now_iso()
+            "event_id": uuid.uuid4().hex,
+            "plate": event.plate,
+            "event": event.event,
+            "confidence": float(event.confidence),
+            "timestamp": event.timestamp
         }
-        if self.config['PUBLISH_IMAGE_BASE64'] and crop_img is not None:
-            buf = BytesIO()
-            crop_img.save(buf, format="JPEG") 
-            b64 = base64.b64encode(buf.getvalue()).decode('utf-8')
-            payload["image_base64"] = b64
-
-        if self.mqtt_enabled and self.client is not None:
-            try:
-                self.client.publish(self.config['MQTT_TOPIC'], json.dumps(payload), qos=1)
-                print(f"[MQTT] {event_type.upper()} - {plate_text} ({confidence:.2f})")
-            except Exception as e:
-                print(f"⚠️ Failed to publish MQTT: {e}")
+        if event.dwell_seconds is not None:
+            payload["dwell_seconds"] = event.dwell_seconds
+
+        image = None
+        mode = self.config['MQTT_IMAGE_MODE']
+        if event.crop_jpeg is not None:
+            if mode == 'base64':
+                payload["image_base64"] = base64.b64encode(event.crop_jpeg).decode('utf-8')
+            elif mode == 'binary':
+                image = event.crop_jpeg
+            elif mode == 'reference' and debug_file:
+                payload["image_url"] = f"/debug_capture/{debug_file}"
+
+        if self.mqtt is not None:
+            self.mqtt.submit(payload, image)
+            print(f"[MQTT] {event.event.upper()} - {event.plate} ({event.confidence:.2f})")
         else:
-            print(f"[MQTT disabled] {event_type.upper()} - {plate_text} ({confidence:.2f})")
+            print(f"[MQTT disabled] {event.event.upper()} - {event.plate} ({event.confidence:.2f})")
 
-    def run_ocr(self, pil_img):
+    def preprocess_plate(self, pil_img):
         """Processes the cropped image using CLAHE, blur, and thresholding for better OCR accuracy."""
         
         img_cv = np.array(pil_img.convert("RGB"))
@@ -137,10 +931,78 @@ class LPProcessor:
         # Enhancement 3: Optimized Adaptive Threshold
         thresh = cv2.adaptiveThreshold(blur, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
                                        cv2.THRESH_BINARY_INV, 15, 1)
-        
-        # Eksekusi EasyOCR 
+        return thresh
+
+    def run_ocr(self, pil_img):
+        """OCR for a single plate crop. Returns (text, confidence)."""
+        return self.run_ocr_batch([pil_img])[0]
+
+    def run_ocr_batch(self, pil_imgs):
+        """OCR for all plate crops of a frame. Returns one (text, confidence) per crop."""
+        return self.recognize_batch([self.preprocess_plate(img) for img in pil_imgs])
+
+    def detect(self, image):
+        """YOLO results for one BGR image, run under model_lock."""
+        with self.model_lock:
+            return self.yolo.predict(image, conf=self.config['CONFIDENCE_THRESHOLD'], verbose=False)
+
+    def recognize_batch(self, threshs):
+        """OCR for already preprocessed plate crops (see preprocess_plate), run under model_lock.
+
+        YOLO already localized the plates, so by default EasyOCR's text detector is skipped and
+        each crop goes straight to the recognizer as one known box. Batching only helps on GPU:
+        EasyOCR's recognize() runs boxes one at a time on CPU, so there each crop gets its own
+        call and only on GPU are the crops stacked on one canvas and recognized in a single call.
+        """
+        if not threshs:
+            return []
+        with self.model_lock:
+            return self._recognize_batch(threshs)
+
+    def _recognize_batch(self, threshs):
+        if not self.config['OCR_SKIP_DETECTOR']:
+            return [self._readtext(thresh) for thresh in threshs]
+
+        if getattr(self.reader, 'device', 'cpu') == 'cpu':
+            outputs = []
+            for thresh in threshs:
+                h, w = thresh.shape
+                results = self.reader.recognize(thresh, horizontal_list=[[0, w, 0, h]], free_list=[], detail=1,
+                                                paragraph=False, allowlist=self.config['OCR_ALLOWLIST'])
+                outputs.append(self._recognized(results[0] if results else None))
+            return outputs
+
+        gap = 8
+        width = max(t.shape[1] for t in threshs)
+        height = sum(t.shape[0] for t in threshs) + gap * (len(threshs) - 1)
+        canvas = np.zeros((height, width), dtype=np.uint8)
+
+        boxes = []  # EasyOCR horizontal_list format: [x_min, x_max, y_min, y_max]
+        y = 0
+        for thresh in threshs:
+            h, w = thresh.shape
+            canvas[y:y + h, :w] = thresh
+            boxes.append([0, w, y, y + h])
+            y += h + gap
+
+        results = self.reader.recognize(canvas, horizontal_list=boxes, free_list=[], detail=1, paragraph=False,
+                                        batch_size=len(boxes), allowlist=self.config['OCR_ALLOWLIST'])
+
+        # Results carry their box corners; map them back to crops by top edge
+        by_top = {int(r[0][0][1]): r for r in results}
+        return [self._recognized(by_top.get(y_min)) for _, _, y_min, _ in boxes]
+
+    @staticmethod
+    def _recognized(result):
+        """(text, confidence) of one EasyOCR recognize() result, ("", 0.0) if there is none."""
+        if result is None:
+            return "", 0.0
+        return "".join([c for c in result[1] if c.isalnum()]).upper(), float(result[2])
+
+    def _readtext(self, thresh):
+        """Full EasyOCR pipeline (text detector + recognizer) on one preprocessed crop."""
         results = self.reader.readtext(thresh, detail=1, paragraph=False, 
-                                       allowlist='0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+                                       allowlist=self.config['OCR_ALLOWLIST'])
 
         if not results:
             return "", 0.0
@@ -169,87 +1031,171 @@ class LPProcessor:
             return None
         return Image.fromarray(cv2.cvtColor(crop, cv2.COLOR_BGR2RGB))
     
-    def _encode_frame_jpeg(self, frame):
-        try:
-            ret, jpeg = cv2.imencode('.jpg', frame)
-            if not ret: return None
-            return jpeg.tobytes()
-        except Exception:
-            return None
+    def _track_expiry(self, plate_text, entry):
+        """Schedules expiry of a newly seen plate. Caller holds self.lock."""
+        entry["expires_at"] = entry["last_seen"] + self.config['EXIT_TIMEOUT']
+        heapq.heappush(self._expiry_heap, (entry["expires_at"], plate_text))
+        if self._expiry_heap[0][1] == plate_text:
+            self._expiry_cond.notify()
 
     def _exit_watcher(self):
+        """Expires plates exactly EXIT_TIMEOUT after they were last seen and publishes EXIT for confirmed ones.
+
+        Sightings only update last_seen; when a plate's heap deadline comes up and it was seen
+        again in the meantime, it is pushed back with its real deadline. Heap entries whose
+        deadline is not the plate's current "expires_at" are stale and dropped.
+        """
+        timeout = self.config['EXIT_TIMEOUT']
         while True:
-            now_ts = time.time()
-            with self.lock:
-                expired = [p for p, v in self.plates_seen.items() if now_ts - v["last_seen"] > self.config['EXIT_TIMEOUT']]
-                for pid in expired:
-                    if pid in self.confirmed_plates:
-                         print(f"[EXIT] Plate {pid} timed out.")
-                         self.confirmed_plates.remove(pid)
-                    del self.plates_seen[pid]
-            time.sleep(1.0)
+            exits = []
+            with self._expiry_cond:
+                while not exits:
+                    if not self._expiry_heap:
+                        self._expiry_cond.wait()
+                        continue
+                    now_ts = time.time()
+                    deadline, plate = self._expiry_heap[0]
+                    if deadline > now_ts:
+                        self._expiry_cond.wait(deadline - now_ts)
+                        continue
+
+                    heapq.heappop(self._expiry_heap)
+                    entry = self.plates_seen.get(plate)
+                    if entry is None or entry["expires_at"] != deadline:
+                        continue
+                    if entry["last_seen"] + timeout > now_ts:
+                        entry["expires_at"] = entry["last_seen"] + timeout
+                        heapq.heappush(self._expiry_heap, (entry["expires_at"], plate))
+                        continue
+
+                    del self.plates_seen[plate]
+                    self._crop_bytes -= entry.get("crop_size", 0)
+                    if plate in self.confirmed_plates:
+                        self.confirmed_plates.remove(plate)
+                        exits.append((plate, entry))
+
+            for plate, entry in exits:
+                dwell = entry["last_seen"] - entry["first_seen"]
+                print(f"[EXIT] Plate {plate} timed out after {dwell:.1f}s.")
+                self.publish_event(PlateEvent("exit", plate, entry["conf"], now_iso(), dwell_seconds=round(dwell, 1)))
             
-    def _save_debug_images(self, plate_text, crop_pil, tag='proc'):
-        """Saves detection crop and a basic processed version."""
-        if not self.config['DEBUG_SAVE']: return
-        
-        try:
-            ts = now_iso().replace(':', '-').split('.')[0] # Use only seconds for cleaner file name
-            # Save detection crop (det)
-            det_path = os.path.join("debug_capture", f"{ts}_{plate_text}_{tag}_det.jpg")
-            crop_pil.save(det_path, quality=85)
-
-            # Generate and save processed OCR image (ocr)
-            img_cv = np.array(crop_pil.convert("RGB"))
-            gray = cv2.cvtColor(img_cv, cv2.COLOR_RGB2GRAY)
-            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(4,4)) 
-            normalized_img = clahe.apply(gray)
-            blur = cv2.GaussianBlur(normalized_img, (3, 3), 0)
-            thresh = cv2.adaptiveThreshold(blur, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                                           cv2.THRESH_BINARY_INV, 15, 1)
-
-            ocr_path = os.path.join("debug_capture", f"{ts}_{plate_text}_{tag}_ocr.jpg")
-            Image.fromarray(thresh).save(ocr_path, quality=85)
-            print(f"   [DEBUG SAVE] Saved {det_path} and {ocr_path}")
-        except Exception as e:
-             print(f"⚠️ Failed to save debug images: {e}")
+    def _is_better_crop(self, plate_text, conf):
+        """Whether a reading's crop would replace the stored one (checked before the lock, to encode outside it)."""
+        entry = self.plates_seen.get(plate_text)
+        return entry is None or (plate_text not in self.confirmed_plates
+                                 and (entry.get("crop") is None or conf >= entry["best_conf"]))
+
+    def _store_best_crop(self, entry, conf, crop_jpeg, thresh_jpeg):
+        """Keeps only the highest-confidence crop of a plate (JPEG bytes). Caller holds self.lock."""
+        if crop_jpeg is None or (entry.get("crop") is not None and conf < entry["best_conf"]):
+            return
+        self._crop_bytes += len(crop_jpeg) + len(thresh_jpeg) - entry.get("crop_size", 0)
+        entry.update(best_conf=conf, crop=crop_jpeg, thresh=thresh_jpeg, crop_size=len(crop_jpeg) + len(thresh_jpeg))
+
+    def _enforce_memory_cap(self):
+        """Evicts least recently seen plates once stored crops exceed PLATE_MEMORY_MB. Caller holds self.lock.
+
+        Unconfirmed plates are dropped entirely; confirmed ones only lose their crop so they do not re-enter.
+        """
+        cap = self.config['PLATE_MEMORY_MB'] * 1024 * 1024
+        if self._crop_bytes <= cap:
+            return
+        for plate in list(self.plates_seen):
+            if self._crop_bytes <= cap:
+                break
+            entry = self.plates_seen[plate]
+            self._crop_bytes -= entry.get("crop_size", 0)
+            if plate in self.confirmed_plates:
+                entry.update(crop=None, thresh=None, crop_size=0)
+            else:
+                del self.plates_seen[plate]
+
+    def _save_debug_images(self, plate_text, crop_jpeg, thresh_jpeg, tag='proc'):
+        """Queues the detection crop and the exact preprocessed image OCR saw for the background writer.
+
+        Returns the file name the detection crop will be saved under.
+        """
+        if not self.config['DEBUG_SAVE']: return None
+
+        ts = now_iso().replace(':', '-').split('.')[0] # Use only seconds for cleaner file name
+        for kind, image in (("det", crop_jpeg), ("ocr", thresh_jpeg)):
+            filename = f"{ts}_{plate_text}_{tag}_{kind}.jpg"
+
+            def on_done(jpeg, filename=filename):
+                if jpeg is not None:
+                    self.debug_catalog.add(filename)
+                    print(f"   [DEBUG SAVE] Saved {filename}")
+
+            self.writer.submit(os.path.join("debug_capture", filename), image, on_done=on_done)
+        return f"{ts}_{plate_text}_{tag}_det.jpg"
             
     # --- Main Processing Methods ---
 
-    def process_image(self, bgr_image: np.ndarray, upload_mode: bool = False) -> List[Dict[str, Any]]:
-        """Process a single image (upload mode), saves debug, and publishes results."""
-        detections = []
-        results = self.yolo.predict(bgr_image, conf=self.config['CONFIDENCE_THRESHOLD'], verbose=False)
-
+    def _collect_boxes(self, results):
+        """Returns (yolo_conf, bbox) for every YOLO box."""
+        boxes = []
         for r in results:
             for box in r.boxes:
-                conf = float(box.conf[0])
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                crop = self.crop_with_padding(bgr_image, (x1, y1, x2, y2))
-                
-                if crop is None: continue
+                boxes.append((float(box.conf[0]), tuple(map(int, box.xyxy[0]))))
+        return boxes
+
+    def _collect_crops(self, bgr_image, results):
+        """Returns (yolo_conf, bbox, crop) for every YOLO box with a non-empty crop."""
+        candidates = []
+        for conf, bbox in self._collect_boxes(results):
+            crop = self.crop_with_padding(bgr_image, bbox)
+            if crop is None: continue
+            candidates.append((conf, bbox, crop))
+        return candidates
+
+    def _follow_confirmed(self, tid, plate_text):
+        """Counts a tracked box of an already confirmed plate as a sighting, without OCR.
+
+        Returns False (and releases the track) when the plate's entry is gone, so it is read again.
+        """
+        with self.lock:
+            entry = self.plates_seen.get(plate_text)
+            if entry is None or plate_text not in self.confirmed_plates:
+                self.tracker.release(tid)
+                return False
+            entry["last_seen"] = time.time()
+            self.plates_seen.move_to_end(plate_text)
+            return True
 
-                plate_text, ocr_conf = self.run_ocr(crop)
-                if len(plate_text) < 4: continue
-                
-                # 1. Debug Save (for upload test)
-                if self.config['DEBUG_SAVE']:
-                    self._save_debug_images(plate_text, crop, tag='upload')
+    def process_image(self, bgr_image: np.ndarray, upload_mode: bool = False) -> List[Dict[str, Any]]:
+        """Process a single image (upload mode), saves debug, and publishes results."""
+        detections = []
+        with METRICS.timer("yolo"):
+            results = self.detect(bgr_image)
+
+        with METRICS.timer("crop"):
+            candidates = self._collect_crops(bgr_image, results)
+        with METRICS.timer("ocr_preprocess"):
+            threshs = [self.preprocess_plate(crop) for _, _, crop in candidates]
+        if threshs:
+            with METRICS.timer("ocr"):
+                ocr_results = self.recognize_batch(threshs)
+        else:
+            ocr_results = []
 
-                # 2. Publish MQTT (for upload test)
-                # Using 'upload_test' event type
-                self.publish_event("upload_test", plate_text, ocr_conf, crop)
-                
-                # 3. Draw visualization
+        for (conf, (x1, y1, x2, y2), crop), thresh, (plate_text, ocr_conf) in zip(candidates, threshs, ocr_results):
+            if len(plate_text) < 4: continue
+            
+            # 1. Publish MQTT + debug save (for upload test), using 'upload_test' event type
+            self.publish_event(PlateEvent("upload_test", plate_text, ocr_conf, now_iso(),
+                                          crop_jpeg=encode_jpeg(crop), thresh_jpeg=encode_jpeg(thresh), debug_tag='upload'))
+            
+            # 2. Draw visualization
+            with METRICS.timer("overlay"):
                 cv2.rectangle(bgr_image, (x1, y1), (x2, y2), (0, 255, 0), 2)
                 cv2.putText(bgr_image, f"{plate_text} ({ocr_conf:.2f})", (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
 
-                detections.append({
-                    'plate': plate_text,
-                    'conf': conf,
-                    'ocr_conf': ocr_conf,
-                    'bbox': (x1, y1, x2, y2),
-                })
+            detections.append({
+                'plate': plate_text,
+                'conf': conf,
+                'ocr_conf': ocr_conf,
+                'bbox': (x1, y1, x2, y2),
+            })
         return detections
 
     def detection_loop(self, display: bool = False, stream: bool = True):
@@ -268,63 +1214,110 @@ class LPProcessor:
         while not self._camera_thread_stop.is_set():
             ret, frame = cap.read()
             if not ret:
+                METRICS.inc("camera_read_failures", help="Camera reads that returned no frame")
                 time.sleep(0.3)
                 continue
+            METRICS.tick("camera_frames", "Frames read from the camera per second over the last 10s")
 
             frame_idx += 1
-            if frame_idx % self.config['FRAME_SKIP'] != 0: continue
-
-            results = self.yolo.predict(frame, conf=self.config['CONFIDENCE_THRESHOLD'], verbose=False)
-
-            for r in results:
-                for box in r.boxes:
-                    conf = float(box.conf[0])
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
+            if frame_idx % self.config['FRAME_SKIP'] != 0:
+                METRICS.inc("frames_skipped", help="Frames dropped by FRAME_SKIP")
+                continue
+            METRICS.tick("processed_frames", "Frames run through YOLO per second over the last 10s")
+
+            with METRICS.timer("yolo"):
+                results = self.detect(frame)
+
+            boxes = self._collect_boxes(results)
+            track_ids = self.tracker.update([bbox for _, bbox in boxes])
+
+            # Confirmed tracks are only followed between re-reads; OCR runs on the rest
+            candidates = []
+            for (conf, (x1, y1, x2, y2)), tid in zip(boxes, track_ids):
+                known = self.tracker.plate(tid)
+                if known is not None and not self.tracker.needs_ocr(tid) and self._follow_confirmed(tid, known):
+                    self.ocr_skipped += 1
+                    with METRICS.timer("overlay"):
+                        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+                        cv2.putText(frame, known, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+                    continue
+                with METRICS.timer("crop"):
                     crop = self.crop_with_padding(frame, (x1, y1, x2, y2))
-                    if crop is None: continue
-
-                    plate_text, ocr_conf = self.run_ocr(crop)
-                    if len(plate_text) < 4: continue
-
-                    # Stability tracking 
-                    with self.lock:
-                        if plate_text not in self.plates_seen:
-                             self.plates_seen[plate_text] = {"count": 1, "last_seen": time.time(), "conf": conf, "texts": [plate_text], "crop": crop}
-                        else:
-                            self.plates_seen[plate_text]["count"] += 1
-                            self.plates_seen[plate_text]["last_seen"] = time.time()
-                            self.plates_seen[plate_text]["conf"] = max(self.plates_seen[plate_text]["conf"], conf)
-                            self.plates_seen[plate_text]["texts"].append(plate_text)
-                            self.plates_seen[plate_text]["crop"] = crop 
-
-                        # Confirmation Check
-                        if self.plates_seen[plate_text]["count"] >= self.config['STABILITY_COUNT']:
-                            texts = self.plates_seen[plate_text]["texts"]
-                            final_text = max(set(texts), key=texts.count)
+                if crop is not None:
+                    candidates.append((conf, (x1, y1, x2, y2), crop, tid))
+
+            with METRICS.timer("ocr_preprocess"):
+                threshs = [self.preprocess_plate(crop) for _, _, crop, _ in candidates]
+            if threshs:
+                with METRICS.timer("ocr"):
+                    ocr_results = self.recognize_batch(threshs)
+            else:
+                ocr_results = []
+
+            for (conf, (x1, y1, x2, y2), crop, tid), thresh, (plate_text, ocr_conf) in zip(candidates, threshs, ocr_results):
+                if len(plate_text) < 4: continue
+
+                known = self.tracker.plate(tid)
+                if known is not None:
+                    if plates_match(known, plate_text, self.config['PLATE_MATCH_EDITS']):
+                        plate_text = known  # re-read of the confirmed plate (small OCR slips included)
+                    else:
+                        # Another plate took over the track (e.g. the next car stopped in the same spot)
+                        self.tracker.release(tid, reset_votes=True)
+                # The track's readings vote; its plate is the winner, whatever this frame read
+                plate_text = self.tracker.vote(tid, plate_text)
+
+                # Encode the crop before taking the lock, and only if it beats the stored one
+                crop_jpeg = thresh_jpeg = None
+                if self._is_better_crop(plate_text, conf):
+                    crop_jpeg, thresh_jpeg = encode_jpeg(crop), encode_jpeg(thresh)
+
+                # Stability tracking (state only; events are published after the lock is released)
+                events = []
+                with self.lock:
+                    entry = self.plates_seen.get(plate_text)
+                    now_ts = time.time()
+                    if entry is None:
+                         entry = {"count": 0, "first_seen": now_ts, "last_seen": now_ts, "conf": conf}
+                         self.plates_seen[plate_text] = entry
+                         self._track_expiry(plate_text, entry)
+                    else:
+                        self.plates_seen.move_to_end(plate_text)
+                    entry["count"] += 1
+                    entry["last_seen"] = now_ts
+                    entry["conf"] = max(entry["conf"], conf)
+                    if plate_text not in self.confirmed_plates:
+                        self._store_best_crop(entry, conf, crop_jpeg, thresh_jpeg)
+
+                    # Confirmation Check
+                    if entry["count"] >= self.config['STABILITY_COUNT'] and plate_text not in self.confirmed_plates:
+                        self.confirmed_plates.add(plate_text)
+
+                        # Publish event ENTRY (+ debug save, only on first confirmation)
+                        events.append(PlateEvent("entry", plate_text, entry["conf"], now_iso(),
+                                                 crop_jpeg=entry.get("crop"), thresh_jpeg=entry.get("thresh"), debug_tag='conf'))
+
+                        # The crop is not needed once the entry is published
+                        self._crop_bytes -= entry.get("crop_size", 0)
+                        entry.update(crop=None, thresh=None, crop_size=0)
+
+                    if plate_text in self.confirmed_plates:
+                        self.tracker.confirm(tid, plate_text)
+
+                    self._enforce_memory_cap()
+
+                for event in events:
+                    self.publish_event(event)
                             
-                            if final_text not in self.confirmed_plates:
-                                self.confirmed_plates.add(final_text)
-                                
-                                final_conf = self.plates_seen[plate_text]["conf"]
-                                final_crop = self.plates_seen[plate_text]["crop"]
-                                
-                                # 1. Publish event ENTRY
-                                self.publish_event("entry", final_text, final_conf, final_crop)
-                                
-                                # 2. Debug save (Saves only on first confirmation)
-                                if self.config['DEBUG_SAVE']:
-                                    self._save_debug_images(final_text, final_crop, tag='conf')
-                                
-                    # Draw for visualization
+                # Draw for visualization
+                with METRICS.timer("overlay"):
                     color = (0, 255, 0) if plate_text in self.confirmed_plates else (0, 165, 255)
                     cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
                     cv2.putText(frame, plate_text, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
 
-            # Update latest frame for streaming
+            # Hand the frame to the live feed (encoded lazily, only for tiers being watched)
             if stream:
-                latest = self._encode_frame_jpeg(frame)
-                if latest is not None:
-                    self.latest_frame_jpeg = latest
+                self.broadcaster.publish(frame)
 
             if display:
                 cv2.imshow("LPR Capture", frame)
@@ -340,56 +1333,46 @@ class LPProcessor:
         self._camera_thread = threading.Thread(target=self.detection_loop, kwargs={'display': display, 'stream': stream}, daemon=True)
         self._camera_thread.start()
 
-    def get_latest_frame(self) -> bytes:
-        return self.latest_frame_jpeg
+    def get_latest_frame(self, tier: str = None) -> bytes:
+        return self.broadcaster.encode(tier)[1]
 
 # ==========================================================
 # ================== FASTAPI / API =========================
 # ==========================================================
 
-app = FastAPI(title="LPR Stable OCR API")
-processor = LPProcessor(CONFIG) 
-processor.start_camera_in_thread(stream=True) 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The server accepts requests right away; models load in the background (see /api/ready/)
+    processor.start()
+    threading.Thread(target=processor.boot, args=(CONFIG['CAMERA_ENABLED'],), daemon=True).start()
+    yield
+    processor.stop()
+
+
+app = FastAPI(title="LPR Stable OCR API", lifespan=lifespan)
+processor = LPProcessor(CONFIG)  # cheap: no models, threads or connections until startup
+result_cache = ResultCache(int(CONFIG['RESULT_CACHE_MB'] * 1024 * 1024), CONFIG['RESULT_CACHE_ENTRIES'])
+
+# Anything that changes upload results must be part of the cache key
+RESULT_CACHE_VERSION = (file_version(processor.detector_path), CONFIG['CONFIDENCE_THRESHOLD'], CONFIG['CROP_PAD'],
+                        CONFIG['OCR_SKIP_DETECTOR'], CONFIG['OCR_ALLOWLIST'])
 
 # --- NEW ENDPOINT: Fetch Debug Files ---
 @app.get("/api/debug_files/")
-def get_debug_files():
+def get_debug_files(limit: int = 10, offset: int = 0, plate: str = None, since: str = None, until: str = None):
+    """Captured det/ocr pairs, newest first.
+
+    - limit / offset: paging (the dashboard shows the first 10)
+    - plate: plate-number prefix, e.g. ?plate=B12
+    - since / until: ISO timestamp prefixes, e.g. ?since=2025-11-11T23:00&until=2025-11-12
+    Total number of matches is returned in the X-Total-Count header.
+    """
     if not CONFIG['DEBUG_SAVE']:
         return JSONResponse(content={"error": "Debug saving is disabled."}, status_code=403)
-    
-    # Filter files and sort by timestamp (newest first)
-    files = [f for f in os.listdir("debug_capture") if f.endswith(('.jpg', '.jpeg'))]
-    
-    # Use the timestamp prefix for sorting (YYYY-MM-DDTHH:MM:SS)
-    files.sort(key=lambda x: x.split('_')[0], reverse=True)
-    
-    # Structure data to easily match det/ocr pairs in frontend
-    debug_data = []
-    
-    # Group pairs (det/ocr) and limit to top 10 results
-    temp_dict = {}
-    for f in files:
-        parts = f.rsplit('_', 2) # Splits by the last two underscores
-        if len(parts) < 3: continue
-        
-        base_name = parts[0] + '_' + parts[1] # e.g., 2025-11-11T10:00:00_PLATEID_tag
-        file_type = parts[2].split('.')[0]    # e.g., det or ocr
-        
-        if base_name not in temp_dict:
-            temp_dict[base_name] = {'det': None, 'ocr': None, 'plate': parts[1], 'timestamp': parts[0].replace('T', ' ')}
-        
-        if file_type == 'det':
-            temp_dict[base_name]['det'] = f
-        elif file_type == 'ocr':
-            temp_dict[base_name]['ocr'] = f
-            
-    # Add pairs to final list (only complete pairs are needed for the gallery)
-    for key, data in temp_dict.items():
-        if data['det'] and data['ocr']:
-            debug_data.append(data)
-            
-    # Return top 10 (or desired limit)
-    return debug_data[:10]
+
+    limit = max(1, min(limit, 500))
+    page, total = processor.debug_catalog.query(limit=limit, offset=max(0, offset), plate=plate, since=since, until=until)
+    return JSONResponse(content=page, headers={"X-Total-Count": str(total)})
 
 # --- NEW ENDPOINT: Serve individual debug files ---
 @app.get("/debug_capture/{filename}")
@@ -405,40 +1388,114 @@ async def serve_debug_file(filename: str):
 @app.post("/api/upload/")
 async def upload_image_for_testing(file: UploadFile = File(...)):
     """Receives an image file, processes it, and returns the result, publishing an MQTT event."""
+    if not processor.ready.is_set():
+        return JSONResponse(status_code=503, content={"error": "Models are not loaded yet.", "phase": processor.phase})
     
     content = await file.read()
-    nparr = np.frombuffer(content, np.uint8)
-    img_np = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    cache_key = result_cache.key(content, *RESULT_CACHE_VERSION)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        # Same image as before: return the stored result without running YOLO / EasyOCR
+        detections, jpeg_bytes = cached
+        return StreamingResponse(
+            io.BytesIO(jpeg_bytes),
+            media_type="image/jpeg",
+            headers={"X-OCR-Results": json.dumps(detections), "X-Cache": "HIT"}
+        )
+
+    img_np = await run_in_threadpool(decode_image, content)
 
     if img_np is None:
         return JSONResponse(status_code=400, content={"error": "Invalid image format"})
 
-    # Process image (this now includes file saving and MQTT publishing)
-    detections = processor.process_image(img_np, upload_mode=True)
+    # Process image (this now includes file saving and MQTT publishing).
+    # YOLO / EasyOCR run in the threadpool so live-feed viewers on the event loop keep streaming.
+    detections = await run_in_threadpool(processor.process_image, img_np, True)
     
     # Encode the visualization image
-    ret, jpeg = cv2.imencode('.jpg', img_np)
+    ret, jpeg = await run_in_threadpool(cv2.imencode, '.jpg', img_np)
     if not ret:
         return JSONResponse(status_code=500, content={"error": "Failed to encode image"})
 
+    jpeg_bytes = jpeg.tobytes()
+    result_cache.put(cache_key, (detections, jpeg_bytes), len(jpeg_bytes))
+
     return StreamingResponse(
-        io.BytesIO(jpeg.tobytes()),
+        io.BytesIO(jpeg_bytes),
         media_type="image/jpeg",
-        headers={"X-OCR-Results": json.dumps(detections)}
+        headers={"X-OCR-Results": json.dumps(detections), "X-Cache": "MISS"}
     )
 
-# --- Endpoint 2: Video Feed ---
-def generate_frame():
-    while True:
-        frame_jpeg = processor.get_latest_frame()
-        if frame_jpeg:
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame_jpeg + b'\r\n')
-        time.sleep(1/30) 
+@app.get("/api/mqtt/")
+def get_mqtt_stats():
+    """MQTT publisher connection state, queue depth and published/spooled/replayed counters."""
+    if processor.mqtt is None:
+        return {"enabled": False}
+    return dict(processor.mqtt.stats(), enabled=True)
+
+@app.get("/api/writer/")
+def get_writer_stats():
+    """Debug-capture writer queue depth and written/dropped/failed counters."""
+    return processor.writer.stats()
+
+@app.get("/api/cache/")
+def get_cache_stats():
+    """Upload result cache hit/miss counters and size."""
+    return result_cache.stats()
+
+@app.get("/api/ready/")
+def get_ready():
+    """Readiness probe: 200 once models are loaded and warmed up, 503 (with the startup phase) before."""
+    if not processor.ready.is_set():
+        return JSONResponse(status_code=503, content={"ready": False, "phase": processor.phase})
+    return {"ready": True, "load_seconds": {name: round(seconds, 3) for name, seconds in processor.load_seconds.items()},
+            "warmup_seconds": processor.warmup_seconds and round(processor.warmup_seconds, 3)}
+
+@app.get("/api/status/")
+def get_status():
+    """Models, camera throughput, queue depths and mean time per pipeline stage."""
+    camera_alive = processor._camera_thread is not None and processor._camera_thread.is_alive()
+    if not processor.ready.is_set():
+        status = processor.phase
+    else:
+        status = "active" if camera_alive or not CONFIG['CAMERA_ENABLED'] else "camera_stopped"
+    return {
+        "status": status,
+        "models_loaded": processor.ready.is_set(),
+        "detector": os.path.basename(processor.detector_path),
+        "load_seconds": {name: round(seconds, 3) for name, seconds in processor.load_seconds.items()},
+        "warmup_seconds": processor.warmup_seconds and round(processor.warmup_seconds, 3),
+        "uptime_seconds": round(time.time() - METRICS.started, 1),
+        "camera": {
+            "enabled": CONFIG['CAMERA_ENABLED'],
+            "running": camera_alive,
+            "fps": round(METRICS.rate("camera_frames"), 2),
+            "processed_fps": round(METRICS.rate("processed_frames"), 2),
+            "read_failures": METRICS.counter("camera_read_failures"),
+            "frames_skipped": METRICS.counter("frames_skipped"),
+        },
+        "stream": {"viewers": processor.broadcaster.subscribers, "encodes": processor.broadcaster.encodes,
+                   "skipped_frames": processor.broadcaster.skipped},
+        "events_queue_depth": processor.events.qsize(),
+        "ocr_skipped": processor.ocr_skipped,
+        "tracked_plates": len(processor.plates_seen),
+        "writer": processor.writer.stats(),
+        "mqtt": dict(processor.mqtt.stats(), enabled=True) if processor.mqtt else {"enabled": False},
+        "cache": result_cache.stats(),
+        "stages_ms": METRICS.stage_summary(),
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
 
+# --- Endpoint 2: Video Feed ---
 @app.get("/api/video_feed/")
-async def video_feed():
-    return StreamingResponse(generate_frame(), media_type="multipart/x-mixed-replace; boundary=frame")
+async def video_feed(tier: str = None):
+    if tier is not None and tier not in processor.broadcaster.tiers:
+        return JSONResponse(status_code=400, content={"error": f"Unknown tier. Use one of {list(processor.broadcaster.tiers)}"})
+    return StreamingResponse(processor.broadcaster.stream(tier), media_type="multipart/x-mixed-replace; boundary=frame")
 
 
 # --- Endpoint 3: UI (HTML - Tailwind Modern Dashboard) ---
@@ -626,7 +1683,7 @@ async def index():
     return HTMLResponse(content=HTML_TEMPLATE)
 
 # Static file mount for serving debug images directly (Crucial for the Gallery)
-app.mount("/debug_capture", StaticFiles(directory="debug_capture"), name="debug_capture")
+app.mount("/debug_capture", StaticFiles(directory="debug_capture", check_dir=False), name="debug_capture")
 
 # ==========================================================
 
@@ -0,0 +1,161 @@
+"""
+MqttPublisher against an in-process broker stand-in: outage -> spool -> replay keeps submission order.
+
+Run from this folder:
+    python -m pytest -q test_mqtt_publisher.py
+"""
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+from plate_capture_easyocr_upload import MqttPublisher
+
+
+class FakeBroker:
+    """In-process stand-in for an MQTT broker. Records every publish; `up` simulates outages."""
+
+    def __init__(self, up: bool = True):
+        self.up = up
+        self.received = []  # (topic, payload bytes)
+        self.lock = threading.Lock()
+
+    def client(self):
+        return FakeClient(self)
+
+    def events(self):
+        """Event payloads (JSON topics only) in arrival order, batches flattened."""
+        out = []
+        with self.lock:
+            for topic, payload in self.received:
+                if "/image/" in topic:
+                    continue
+                data = json.loads(payload)
+                out.extend(data if isinstance(data, list) else [data])
+        return out
+
+
+class FakeClient:
+    """The subset of paho.mqtt.client.Client that MqttPublisher uses."""
+
+    def __init__(self, broker: FakeBroker):
+        self.broker = broker
+        self._connected = False
+
+    def connect(self, host, port, keepalive=60):
+        if not self.broker.up:
+            raise ConnectionRefusedError("broker down")
+        self._connected = True
+
+    def loop_start(self):
+        pass
+
+    def is_connected(self):
+        return self._connected and self.broker.up
+
+    def publish(self, topic, payload, qos=0):
+        if not self.broker.up:
+            self._connected = False
+            return SimpleNamespace(rc=4)  # MQTT_ERR_NO_CONN
+        with self.broker.lock:
+            self.broker.received.append((topic, payload))
+        return SimpleNamespace(rc=0)
+
+
+def make_publisher(broker, tmp_path, **kwargs):
+    kwargs.setdefault("backoff_max", 0.05)
+    return MqttPublisher("fake", 1883, "test/lpr", client_factory=broker.client,
+                         spool_path=str(tmp_path / "spool.jsonl"), **kwargs)
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def event(i, kind="entry"):
+    return {"event_id": f"e{i}", "plate": f"B{i:04d}", "event": kind}
+
+
+def test_outage_spool_replay_keeps_order(tmp_path):
+    broker = FakeBroker(up=False)
+    publisher = make_publisher(broker, tmp_path, queue_size=2)
+    publisher.start()
+    for i in range(5):
+        publisher.submit(event(i))
+    assert wait_for(lambda: publisher.stats()["spool_pending"] == 5)
+
+    broker.up = True
+    assert wait_for(lambda: len(broker.events()) == 5)
+    assert [e["event_id"] for e in broker.events()] == [f"e{i}" for i in range(5)]
+    publisher.stop()
+    assert not (tmp_path / "spool.jsonl").exists()
+
+
+def test_outage_mid_stream_keeps_order(tmp_path):
+    broker = FakeBroker(up=True)
+    publisher = make_publisher(broker, tmp_path, queue_size=2)
+    publisher.start()
+    publisher.submit(event(0))
+    assert wait_for(lambda: len(broker.events()) == 1)
+
+    broker.up = False
+    for i in range(1, 7):
+        publisher.submit(event(i))
+    time.sleep(0.2)
+    broker.up = True
+    assert wait_for(lambda: len(broker.events()) == 7)
+    assert [e["event_id"] for e in broker.events()] == [f"e{i}" for i in range(7)]
+    publisher.stop()
+
+
+def test_overflow_while_queued_keeps_order(tmp_path):
+    # Queue overflows before the worker connects: the queue moves to the spool, new events go behind it
+    broker = FakeBroker(up=True)
+    publisher = make_publisher(broker, tmp_path, queue_size=2)
+    for i in range(6):
+        publisher.submit(event(i))
+    publisher.start()
+    for i in range(6, 9):
+        publisher.submit(event(i))
+    assert wait_for(lambda: len(broker.events()) == 9)
+    assert [e["event_id"] for e in broker.events()] == [f"e{i}" for i in range(9)]
+    publisher.stop()
+
+
+def test_entry_before_exit_with_images_and_batches(tmp_path):
+    broker = FakeBroker(up=False)
+    publisher = make_publisher(broker, tmp_path, queue_size=3, batch_size=4, batch_ms=20)
+    publisher.start()
+    publisher.submit(event(0, "entry"), image=b"\xff\xd8jpeg")
+    publisher.submit(event(0, "exit"))
+    publisher.submit(event(1, "entry"))
+    broker.up = True
+    assert wait_for(lambda: len(broker.events()) == 3)
+    assert [(e["event_id"], e["event"]) for e in broker.events()] == [("e0", "entry"), ("e0", "exit"), ("e1", "entry")]
+    # The raw image goes out right before its event
+    assert broker.received[0][0] == "test/lpr/image/e0"
+    publisher.stop()
+
+
+def test_stop_spools_pending_and_next_start_replays(tmp_path):
+    broker = FakeBroker(up=False)
+    publisher = make_publisher(broker, tmp_path)
+    publisher.start()
+    for i in range(3):
+        publisher.submit(event(i))
+    publisher.stop()
+    assert broker.events() == []
+    assert len((tmp_path / "spool.jsonl").read_text().splitlines()) == 3
+
+    broker.up = True
+    restarted = make_publisher(broker, tmp_path)
+    restarted.start()
+    restarted.submit(event(3))
+    assert wait_for(lambda: len(broker.events()) == 4)
+    assert [e["event_id"] for e in broker.events()] == [f"e{i}" for i in range(4)]
+    restarted.stop()
@@ -3,12 +3,18 @@ import os
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from PIL import Image, ImageTk
-from ultralytics import solutions
+from ultralytics import YOLO
 import threading
 import yt_dlp
-from datetime import datetime, timedelta
+import numpy as np
 import time
 
+from parking_engine import IncrementalParking, ParkingEngine, ParkingLayout, SpotTracker, format_dwell
+from stream_pipeline import LatestQueue, MotionGate
+from metrics import RollingRate
+
+RENDER_INTERVAL_MS = 15  # how often the Tk thread picks up the newest processed frame
+
 class ParkingApp:
     def __init__(self, root):
         self.root = root
@@ -19,15 +25,23 @@ class ParkingApp:
         self.result_folder = "result"
         os.makedirs(self.result_folder, exist_ok=True)
 
-        # Initialize Parking Manager
-        self.parkingmanager = solutions.ParkingManagement(
-            model=r"C:\Users\Fauzi.HEC\Desktop\Hackaton\parking_management\visdrone-best.pt",
-            json_file=r"C:\Users\Fauzi.HEC\Desktop\Hackaton\parking_management\bounding_boxes_location_2.json",
+        # Initialize Parking Engine
+        self.engine = ParkingEngine(
+            YOLO(r"C:\Users\Fauzi.HEC\Desktop\Hackaton\parking_management\visdrone-best.pt"),
+            ParkingLayout(r"C:\Users\Fauzi.HEC\Desktop\Hackaton\parking_management\bounding_boxes_location_2.json"),
         )
 
         self.streaming = False
         self.cap = None
-        self.parking_start_times = {}  # Track when each spot was occupied
+        self.spot_tracker = SpotTracker(len(self.engine.layout))  # Track when each spot was occupied
+
+        # Capture -> inference -> render hand-off (latest frame wins)
+        self.frame_queue = LatestQueue()
+        self.result_queue = LatestQueue()
+
+        # Skip YOLO while the scene is static, and only re-detect the spots that changed
+        self.motion_gate = MotionGate()
+        self.incremental = IncrementalParking(self.engine)
         self.setup_ui()
 
     def setup_ui(self):
@@ -64,11 +78,11 @@ class ParkingApp:
     def process_image(self, image_path):
         try:
             image = cv2.imread(image_path)
-            results = self.parkingmanager(image)
+            results = self.engine.process([image])[0]
             
-            # Get parking stats from parkingmanager
-            occupied = self.parkingmanager.pr_info["Occupancy"]
-            available = self.parkingmanager.pr_info["Available"]
+            # Get parking stats
+            occupied = results.occupied
+            available = results.available
             
             # Print to terminal
             print(f"Occupancy: {occupied}")
@@ -140,19 +154,24 @@ class ParkingApp:
         if stream_url:
             self.streaming = True
             self.stream_btn.config(text="Stop Stream", bg="red")
-            self.stream_thread = threading.Thread(target=self.process_stream, args=(stream_url,))
-            self.stream_thread.daemon = True
-            self.stream_thread.start()
+            self.frame_queue = LatestQueue()
+            self.result_queue = LatestQueue()
+            self.capture_thread = threading.Thread(target=self.capture_stream, args=(stream_url,), daemon=True)
+            self.inference_thread = threading.Thread(target=self.process_stream, daemon=True)
+            self.capture_thread.start()
+            self.inference_thread.start()
+            self.root.after(RENDER_INTERVAL_MS, self.render_stream)
 
     def stop_stream(self):
         self.streaming = False
         if self.cap:
             self.cap.release()
-        self.parking_start_times.clear()  # Reset parking times
+        self.spot_tracker.reset()  # Reset parking times
         self.stream_btn.config(text="Start YouTube Stream", bg="green")
         self.result_label.config(text="Stream stopped")
 
-    def process_stream(self, stream_url):
+    def capture_stream(self, stream_url):
+        """Stage 1: read frames as fast as the source delivers them."""
         self.cap = cv2.VideoCapture(stream_url)
         
         # Optimize for real-time streaming
@@ -160,84 +179,91 @@ class ParkingApp:
         self.cap.set(cv2.CAP_PROP_FPS, 30)  # Set target FPS
         
         if not self.cap.isOpened():
-            messagebox.showerror("Error", "Failed to open stream")
-            self.stop_stream()
+            self.root.after(0, self.on_stream_error, "Failed to open stream")
             return
 
-        frame_count = 0
-        start_time = time.time()
-        
         while self.streaming:
             ret, frame = self.cap.read()
             if not ret:
                 # Skip frame and continue
                 continue
 
-            frame_count += 1
+            # Older frames still waiting for inference are dropped
+            self.frame_queue.put((time.time(), frame))
+
+        if self.cap:
+            self.cap.release()
+
+    def process_stream(self):
+        """Stage 2: run parking detection on the newest captured frame."""
+        fps_meter = RollingRate(window=5.0)
+        self.motion_gate.reset()
+        self.incremental = IncrementalParking(self.engine)
+        
+        while self.streaming:
+            item = self.frame_queue.get(timeout=0.5)
+            if item is None:
+                continue
+            captured_at, frame = item
+
+            fps_meter.tick()
             
-            # Process every frame for real-time detection
             try:
-                # Process frame with parking detection
-                results = self.parkingmanager(frame)
+                # Process frame with parking detection (only the spots that changed, if anything moved)
+                if self.motion_gate.should_process(frame):
+                    # A forced gate refresh re-detects every spot, even if no signature moved
+                    results = self.incremental.process(frame, force=self.motion_gate.last_forced)
+                else:
+                    results = self.incremental.render_cached(frame)
+                self.spot_tracker.update(results.spot_box >= 0)
                 
                 # Get parking stats
-                occupied = self.parkingmanager.pr_info["Occupancy"]
-                available = self.parkingmanager.pr_info["Available"]
+                occupied = results.occupied
+                available = results.available
                 
                 # Add duration overlay to frame
                 frame_with_duration = self.add_duration_overlay(results.plot_im)
                 
-                # Calculate and display FPS at bottom left corner
-                elapsed_time = time.time() - start_time
-                if elapsed_time > 0:
-                    fps = frame_count / elapsed_time
-                    cv2.putText(frame_with_duration, f"FPS: {fps:.1f}", 
+                # Display FPS over the last few seconds at bottom left corner
+                fps = fps_meter.rate()
+                if fps > 0:
+                    cv2.putText(frame_with_duration, f"FPS: {fps:.1f} | Skipped: {self.motion_gate.skipped}", 
                                (10, frame_with_duration.shape[0] - 10), 
                                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
                 
-                # Update UI in main thread (non-blocking)
-                self.root.after_idle(self.update_stream_display, frame_with_duration, occupied, available)
-                
-                # Small delay to prevent overwhelming the UI thread
-                time.sleep(0.01)  # 10ms delay for ~100 FPS max
+                self.result_queue.put((captured_at, frame_with_duration, occupied, available))
                 
             except Exception as e:
                 print(f"Error processing frame: {e}")
                 continue
 
-        if self.cap:
-            self.cap.release()
+    def render_stream(self):
+        """Stage 3 (Tk thread): show the newest processed frame, if any."""
+        if not self.streaming:
+            return
+        item = self.result_queue.get(timeout=0)
+        if item is not None:
+            captured_at, processed_frame, occupied, available = item
+            lag_ms = (time.time() - captured_at) * 1000
+            self.update_stream_display(processed_frame, occupied, available, lag_ms)
+        self.root.after(RENDER_INTERVAL_MS, self.render_stream)
+
+    def on_stream_error(self, message):
+        messagebox.showerror("Error", message)
+        self.stop_stream()
 
     def add_duration_overlay(self, frame):
-        current_time = datetime.now()
-        
-        # Track parking durations (simplified - using occupancy count as spot ID)
-        if hasattr(self.parkingmanager, 'pr_info') and 'Occupancy' in self.parkingmanager.pr_info:
-            occupied_count = self.parkingmanager.pr_info['Occupancy']
-            
-            # Update parking times
-            for spot_id in range(occupied_count):
-                if spot_id not in self.parking_start_times:
-                    self.parking_start_times[spot_id] = current_time
-            
-            # Remove spots that are no longer occupied
-            spots_to_remove = []
-            for spot_id in self.parking_start_times:
-                if spot_id >= occupied_count:
-                    spots_to_remove.append(spot_id)
-            for spot_id in spots_to_remove:
-                del self.parking_start_times[spot_id]
+        dwell = self.spot_tracker.dwell()
+        occupied_spots = np.nonzero(self.spot_tracker.occupied)[0]
         
-        # Add parking text overlay (without duration numbers)
+        # Add parking duration overlay for every occupied spot
         y_offset = 30
-        for spot_id, start_time in self.parking_start_times.items():
-            duration_text = "Parkir"
-            
-            cv2.putText(frame, duration_text, (10, y_offset), 
+        if len(occupied_spots):
+            cv2.putText(frame, "Parkir", (10, y_offset), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
             y_offset += 25
-            minutes = int((duration.total_seconds() % 3600) // 60)
-            duration_text = f"Spot {spot_id+1}: {hours:02d}:{minutes:02d}"
+        for spot_id in occupied_spots:
+            duration_text = f"Spot {spot_id+1}: {format_dwell(dwell[spot_id])}"
             
             cv2.putText(frame, duration_text, (10, y_offset), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
@@ -245,11 +271,15 @@ class ParkingApp:
         
         return frame
 
-    def update_stream_display(self, processed_frame, occupied, available):
+    def update_stream_display(self, processed_frame, occupied, available, lag_ms):
         if self.streaming:
             try:
                 self.display_image(processed_frame)
-                self.result_label.config(text=f"LIVE - Occupancy: {occupied} | Available: {available}")
+                self.result_label.config(
+                    text=f"LIVE - Occupancy: {occupied} | Available: {available} | "
+                         f"Lag: {lag_ms:.0f} ms | Dropped: {self.frame_queue.dropped} capture / "
+                         f"{self.result_queue.dropped} render"
+                )
             except Exception as e:
                 print(f"Error updating display: {e}")
 
@@ -1,6 +1,9 @@
 import cv2
 
-from ultralytics import solutions
+from ultralytics import YOLO
+
+from parking_engine import IncrementalParking, ParkingEngine, ParkingLayout
+from stream_pipeline import MotionGate
 
 # Video capture
 cap = cv2.VideoCapture(r"C:\Users\Fauzi.HEC\Desktop\Hackaton\parking_management\parking_crop_loop.mp4")
@@ -10,23 +13,38 @@ assert cap.isOpened(), "Error reading video file"
 w, h, fps = (int(cap.get(x)) for x in (cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT, cv2.CAP_PROP_FPS))
 video_writer = cv2.VideoWriter("parking management.avi", cv2.VideoWriter_fourcc(*"mp4v"), fps, (w, h))
 
-# Initialize parking management object
-parkingmanager = solutions.ParkingManagement(
-    model=r"C:\Users\Fauzi.HEC\Desktop\Hackaton\parking_management\visdrone-best.pt",  # path to model file
-    json_file=r"C:\Users\Fauzi.HEC\Desktop\Hackaton\parking_management\bounding_boxes_location_3.json",  # path to parking annotations file
+# Initialize parking engine
+engine = ParkingEngine(
+    YOLO(r"C:\Users\Fauzi.HEC\Desktop\Hackaton\parking_management\visdrone-best.pt"),  # path to model file
+    ParkingLayout(r"C:\Users\Fauzi.HEC\Desktop\Hackaton\parking_management\bounding_boxes_location_3.json"),  # path to parking annotations file
 )
 
+# Skip YOLO on frames where nothing moved; forced refresh every 10 s of video
+motion_gate = MotionGate(refresh_interval=10.0)
+# When something moved, only re-detect the spots whose pixels changed
+incremental = IncrementalParking(engine)
+frame_idx = 0
+
 while cap.isOpened():
     ret, im0 = cap.read()
     if not ret:
         break
 
-    results = parkingmanager(im0)
+    frame_idx += 1
+    video_time = frame_idx / (fps or 30)
+    if motion_gate.should_process(im0, now=video_time):
+        # A forced gate refresh re-detects every spot, even if no signature moved
+        results = incremental.process(im0, now=video_time, force=motion_gate.last_forced)
+    else:
+        results = incremental.render_cached(im0)
 
     # print(results)  # access the output
 
     video_writer.write(results.plot_im)  # write the processed frame.
 
+print(f"Frames: {frame_idx} | Inference: {motion_gate.processed} | Skipped: {motion_gate.skipped} | Forced refresh: {motion_gate.forced}")
+print(f"Full-frame passes: {incremental.full_runs} | Crop passes: {incremental.crop_runs} | Unchanged: {incremental.reused}")
+
 cap.release()
 video_writer.release()
 cv2.destroyAllWindows()  # destroy all opened windows
\ No newline at end of file
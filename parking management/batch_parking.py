@@ -0,0 +1,284 @@
+"""
+Batch Parking - Parallel offline processing of recorded videos and image folders
+- Splits every video into chunks of --chunk-frames frames (image folders into shards of
+  --chunk-frames images) and runs them in a process pool, one YOLO model per worker.
+- Frames inside a chunk go through the model --batch at a time; with --motion-gate, frames
+  where nothing moved reuse the previous detections instead of running YOLO.
+- Writes a per-frame occupancy table (CSV, or Parquet when pandas + pyarrow are installed)
+  and, with --annotate, the annotated video / images, merged back in frame order.
+- Resumable: finished chunks leave a .done marker in <output>/parts and are skipped when the
+  same command is run again. Use --restart to throw away previous progress.
+
+Usage:
+    python batch_parking.py parking_crop_loop.mp4 --layout bounding_boxes_location_3.json --workers 4
+    python batch_parking.py location_1 --layout bounding_boxes_location_1.json --annotate --format parquet
+"""
+import argparse
+import csv
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+
+from model_export import BACKENDS, export_model, exported_path, load_detector
+from parking_engine import ParkingEngine, ParkingLayout
+from stream_pipeline import MotionGate
+
+MODEL_PATH = os.getenv('PARKING_MODEL', r"C:\Users\Fauzi.HEC\Desktop\Hackaton\parking_management\visdrone-best.pt")
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png')
+COLUMNS = ["source", "frame", "time_s", "file", "occupied", "available", "spots"]
+
+# Set once per worker process by _init_worker
+_ENGINE = None
+
+
+def list_images(folder):
+    files = [f for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTS)]
+    # Frames are numbered 1.jpg, 2.jpg, ...; keep numeric order when possible
+    files.sort(key=lambda f: (0, int(os.path.splitext(f)[0])) if os.path.splitext(f)[0].isdigit() else (1, f))
+    return files
+
+
+def plan_jobs(inputs, chunk_frames):
+    """One job per chunk: {"id", "source", "kind", "index", "start", "end", ...} in output order."""
+    jobs = []
+    for source in inputs:
+        stem = os.path.splitext(os.path.basename(os.path.normpath(source)))[0]
+        base = {"source": os.path.abspath(source), "stem": stem}
+        if os.path.isdir(source):
+            files = list_images(source)
+            total = len(files)
+            base["kind"] = "images"
+        else:
+            cap = cv2.VideoCapture(source)
+            if not cap.isOpened():
+                raise SystemExit(f"❌ Cannot open video {source}")
+            total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            base.update(kind="video", fps=cap.get(cv2.CAP_PROP_FPS) or 30,
+                        size=(int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))))
+            cap.release()
+
+        for index, start in enumerate(range(0, total, chunk_frames)):
+            end = min(start + chunk_frames, total)
+            job = dict(base, id=f"{stem}_{index:05d}", index=index, start=start, end=end)
+            if base["kind"] == "images":
+                job["files"] = files[start:end]
+            jobs.append(job)
+    return jobs
+
+
+def _init_worker(model_path, backend, int8, layout_path, conf, threads):
+    """Loads the model once per worker process."""
+    global _ENGINE
+    cv2.setNumThreads(1)
+    import torch
+    # Workers share the CPU; without this every worker's torch would use every core
+    torch.set_num_threads(threads)
+    model = load_detector(model_path, backend, int8, export_missing=False)
+    _ENGINE = ParkingEngine(model, ParkingLayout(layout_path), conf=conf)
+
+
+def _read_frames(job):
+    """Yields (frame number, time in seconds, file name or '', BGR frame) for the job's span."""
+    if job["kind"] == "images":
+        for offset, name in enumerate(job["files"]):
+            frame = cv2.imread(os.path.join(job["source"], name))
+            if frame is not None:
+                yield job["start"] + offset, "", name, frame
+        return
+
+    cap = cv2.VideoCapture(job["source"])
+    cap.set(cv2.CAP_PROP_POS_FRAMES, job["start"])
+    try:
+        for number in range(job["start"], job["end"]):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield number, round(number / job["fps"], 3), "", frame
+    finally:
+        cap.release()
+
+
+def _batches(frames, size):
+    batch = []
+    for item in frames:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def run_job(job, parts_dir, batch_size, imgsz, motion_gate, annotate, annotated_dir):
+    """Processes one chunk in a worker. Writes its rows (and annotated frames) under parts_dir."""
+    started = time.perf_counter()
+    engine = _ENGINE
+    gate = MotionGate() if motion_gate else None
+    last = (np.zeros((0, 4), dtype=np.float32), np.zeros((0,), dtype=np.int32))
+    rows, inferred = [], 0
+
+    writer = None
+    video_part = os.path.join(parts_dir, f"{job['id']}.avi")
+    if annotate and job["kind"] == "video":
+        writer = cv2.VideoWriter(video_part + ".tmp.avi", cv2.VideoWriter_fourcc(*"mp4v"), job["fps"], tuple(job["size"]))
+
+    for batch in _batches(_read_frames(job), batch_size):
+        # The gate needs a timeline: the video clock, or one second per image
+        run = [gate is None or gate.should_process(frame, now=number if t == "" else t)
+               for number, t, _, frame in batch]
+        detections = iter(engine.predict([item[3] for item, r in zip(batch, run) if r], imgsz) if any(run) else [])
+        inferred += sum(run)
+
+        for (number, t, name, frame), r in zip(batch, run):
+            if r:
+                last = next(detections)
+            result = engine.finish(frame, *last)
+            spots = "".join("1" if b >= 0 else "0" for b in result.spot_box)
+            rows.append([job["stem"], number, t, name, result.occupied, result.available, spots])
+            if writer is not None:
+                writer.write(result.plot_im)
+            elif annotate:
+                cv2.imwrite(os.path.join(annotated_dir, job["stem"], name), result.plot_im)
+
+    if writer is not None:
+        writer.release()
+        os.replace(video_part + ".tmp.avi", video_part)
+
+    rows_tmp = os.path.join(parts_dir, f"{job['id']}.csv.tmp")
+    with open(rows_tmp, "w", newline="") as f:
+        csv.writer(f).writerows(rows)
+    os.replace(rows_tmp, os.path.join(parts_dir, f"{job['id']}.csv"))
+
+    done = {"frames": len(rows), "inferred": inferred, "seconds": round(time.perf_counter() - started, 3)}
+    with open(os.path.join(parts_dir, f"{job['id']}.done"), "w") as f:
+        json.dump(done, f)
+    return job["id"], done
+
+
+def merge(jobs, parts_dir, output_dir, fmt, annotate):
+    """Concatenates the chunk outputs in plan order."""
+    rows = []
+    for job in jobs:
+        with open(os.path.join(parts_dir, f"{job['id']}.csv"), newline="") as f:
+            rows.extend(csv.reader(f))
+
+    if fmt == "parquet":
+        import pandas as pd
+        df = pd.DataFrame(rows, columns=COLUMNS)
+        for col in ("frame", "occupied", "available"):
+            df[col] = df[col].astype(int)
+        df["time_s"] = pd.to_numeric(df["time_s"], errors="coerce")
+        table_path = os.path.join(output_dir, "occupancy.parquet")
+        df.to_parquet(table_path, index=False)
+    else:
+        table_path = os.path.join(output_dir, "occupancy.csv")
+        with open(table_path, "w", newline="") as f:
+            out = csv.writer(f)
+            out.writerow(COLUMNS)
+            out.writerows(rows)
+    print(f"📝 {len(rows)} frames written to {table_path}")
+
+    if not annotate:
+        return
+    videos = {}
+    for job in jobs:
+        if job["kind"] == "video":
+            videos.setdefault(job["stem"], []).append(job)
+    for stem, chunks in videos.items():
+        path = os.path.join(output_dir, f"{stem}_annotated.avi")
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), chunks[0]["fps"], tuple(chunks[0]["size"]))
+        for job in chunks:
+            cap = cv2.VideoCapture(os.path.join(parts_dir, f"{job['id']}.avi"))
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                writer.write(frame)
+            cap.release()
+        writer.release()
+        print(f"🎞️ Annotated video written to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process recorded parking videos / image folders in parallel")
+    parser.add_argument("inputs", nargs="+", help="video files and/or image folders")
+    parser.add_argument("--layout", required=True, help="bounding_boxes_<location>.json for these inputs")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--backend", choices=BACKENDS, default="pytorch")
+    parser.add_argument("--int8", action="store_true", help="use the INT8-quantized export of --backend")
+    parser.add_argument("--output", default="batch_results")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--chunk-frames", type=int, default=900, help="frames (or images) per job")
+    parser.add_argument("--batch", type=int, default=4, help="frames per forward pass inside a job")
+    parser.add_argument("--imgsz", type=int, default=None, help="inference size (default: model's)")
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--motion-gate", action="store_true", help="reuse detections on frames where nothing moved")
+    parser.add_argument("--annotate", action="store_true", help="also write annotated video / images")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--restart", action="store_true", help="discard progress from a previous run")
+    args = parser.parse_args()
+
+    if args.format == "parquet":
+        try:
+            import pandas, pyarrow  # noqa: F401
+        except ImportError:
+            raise SystemExit("❌ --format parquet needs pandas and pyarrow (pip install pandas pyarrow)")
+
+    parts_dir = os.path.join(args.output, "parts")
+    annotated_dir = os.path.join(args.output, "annotated")
+    if args.restart and os.path.isdir(parts_dir):
+        shutil.rmtree(parts_dir)
+    os.makedirs(parts_dir, exist_ok=True)
+
+    jobs = plan_jobs(args.inputs, max(1, args.chunk_frames))
+    settings = {"inputs": [os.path.abspath(p) for p in args.inputs], "layout": os.path.abspath(args.layout),
+                "model": args.model, "backend": args.backend,
+                "int8": args.int8, "chunk_frames": args.chunk_frames, "imgsz": args.imgsz, "conf": args.conf,
+                "motion_gate": args.motion_gate, "annotate": args.annotate}
+
+    # Chunks finished under different settings cannot be mixed with new ones
+    plan_path = os.path.join(parts_dir, "plan.json")
+    if os.path.exists(plan_path):
+        with open(plan_path) as f:
+            if json.load(f) != settings:
+                raise SystemExit(f"❌ {parts_dir} holds progress from a run with other settings; use --restart")
+    with open(plan_path, "w") as f:
+        json.dump(settings, f, indent=2)
+
+    if args.annotate:
+        for stem in {job["stem"] for job in jobs if job["kind"] == "images"}:
+            os.makedirs(os.path.join(annotated_dir, stem), exist_ok=True)
+
+    pending = [job for job in jobs if not os.path.exists(os.path.join(parts_dir, f"{job['id']}.done"))]
+    print(f"📦 {len(jobs)} chunks from {len(args.inputs)} inputs, {len(jobs) - len(pending)} already done, "
+          f"{len(pending)} to process on {args.workers} workers")
+
+    started = time.perf_counter()
+    frames = 0
+    if pending:
+        # Export once here rather than in every worker
+        if not os.path.exists(exported_path(args.model, args.backend, args.int8)):
+            export_model(args.model, args.backend, args.int8, imgsz=args.imgsz or 640)
+        threads = max(1, (os.cpu_count() or 1) // max(1, args.workers))
+        with ProcessPoolExecutor(max_workers=max(1, args.workers), initializer=_init_worker,
+                                 initargs=(args.model, args.backend, args.int8, args.layout, args.conf, threads)) as pool:
+            futures = [pool.submit(run_job, job, parts_dir, max(1, args.batch), args.imgsz, args.motion_gate,
+                                   args.annotate, annotated_dir) for job in pending]
+            for n, future in enumerate(as_completed(futures), 1):
+                job_id, done = future.result()
+                frames += done["frames"]
+                print(f"   ✅ [{n}/{len(pending)}] {job_id}: {done['frames']} frames "
+                      f"({done['inferred']} inferred) in {done['seconds']}s")
+        wall = time.perf_counter() - started
+        print(f"⏱️ {frames} frames in {wall:.1f}s ({frames / wall:.1f} fps)")
+
+    merge(jobs, parts_dir, args.output, args.format, args.annotate)
+
+
+if __name__ == "__main__":
+    main()
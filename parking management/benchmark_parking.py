@@ -0,0 +1,199 @@
+"""
+Parking Benchmark - Offline replay of the bundled location image sets
+- Runs every frame of location_1/, location_2/ (or any folder with a layout JSON) through ParkingEngine.
+- Times each stage separately: decode, inference, spot assignment, render, encode.
+- Reports mean / p50 / p90 / p99 / max per stage, end-to-end throughput and peak RSS.
+- Writes a JSON report (with model and git versions) so runs can be compared across commits.
+- --backend / --int8 run the same replay on an ONNX Runtime or OpenVINO export (see model_export.py).
+
+Usage:
+    python benchmark_parking.py
+    python benchmark_parking.py --locations location_1 --batch 4 --repeat 3 --output bench/run.json
+    python benchmark_parking.py --backend openvino --int8
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from model_export import BACKENDS, load_detector
+from parking_engine import ParkingEngine, ParkingLayout
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.getenv('PARKING_MODEL', r"C:\Users\Fauzi.HEC\Desktop\Hackaton\parking_management\visdrone-best.pt")
+STAGES = ("decode", "inference", "assign", "render", "encode")
+PERCENTILES = (50, 90, 99)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None if the platform does not expose it."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KB, macOS bytes
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return round(getattr(info, "peak_wset", info.rss) / (1024 * 1024), 1)
+    except ImportError:
+        return None
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                             capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def summarize(samples_ms):
+    samples = np.asarray(samples_ms, dtype=np.float64)
+    if samples.size == 0:
+        return None
+    summary = {"mean": round(float(samples.mean()), 3)}
+    for p in PERCENTILES:
+        summary[f"p{p}"] = round(float(np.percentile(samples, p)), 3)
+    summary["max"] = round(float(samples.max()), 3)
+    return summary
+
+
+def list_frames(folder):
+    files = [f for f in os.listdir(folder) if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
+    # Frames are numbered 1.jpg, 2.jpg, ...; keep numeric order when possible
+    files.sort(key=lambda f: (0, int(os.path.splitext(f)[0])) if os.path.splitext(f)[0].isdigit() else (1, f))
+    return [os.path.join(folder, f) for f in files]
+
+
+def bench_location(engine, frames, batch_size, repeat, warmup, imgsz):
+    """Replays `frames` through the engine. Times are per frame, in ms (inference is split over its batch)."""
+    timings = {stage: [] for stage in STAGES}
+    raw = [open(path, 'rb').read() for path in frames]
+    occupancy = []
+
+    # Warm-up batches (model initialisation, allocator, cuDNN autotune) are not measured
+    for _ in range(warmup):
+        warm = [cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR) for data in raw[:batch_size]]
+        engine.predict(warm, imgsz)
+
+    wall_start = time.perf_counter()
+    for _ in range(repeat):
+        for start in range(0, len(raw), batch_size):
+            images = []
+            for data in raw[start:start + batch_size]:
+                t0 = time.perf_counter()
+                images.append(cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR))
+                timings["decode"].append((time.perf_counter() - t0) * 1000)
+
+            t0 = time.perf_counter()
+            detections = engine.predict(images, imgsz)
+            per_frame = (time.perf_counter() - t0) * 1000 / len(images)
+            timings["inference"].extend([per_frame] * len(images))
+
+            for im0, (boxes, clss) in zip(images, detections):
+                t0 = time.perf_counter()
+                spot_box = engine.layout.assign(boxes)
+                timings["assign"].append((time.perf_counter() - t0) * 1000)
+
+                t0 = time.perf_counter()
+                result = engine.render(im0, spot_box, boxes, clss)
+                timings["render"].append((time.perf_counter() - t0) * 1000)
+
+                t0 = time.perf_counter()
+                cv2.imencode('.jpg', result.plot_im)
+                timings["encode"].append((time.perf_counter() - t0) * 1000)
+                occupancy.append(result.occupied)
+    wall = time.perf_counter() - wall_start
+
+    n = len(raw) * repeat
+    return {
+        "frames": n,
+        "spots": len(engine.layout),
+        "wall_seconds": round(wall, 3),
+        "throughput_fps": round(n / wall, 2) if wall > 0 else None,
+        "mean_occupied": round(float(np.mean(occupancy)), 2) if occupancy else None,
+        "stages_ms": {stage: summarize(samples) for stage, samples in timings.items()},
+        "total_ms": summarize(np.sum([timings[s] for s in STAGES], axis=0)) if n else None,
+    }
+
+
+def print_report(report):
+    for location, res in report["locations"].items():
+        print(f"\n📍 {location}: {res['frames']} frames, {res['spots']} spots, "
+              f"{res['throughput_fps']} fps, mean occupied {res['mean_occupied']}")
+        print(f"   {'stage':<10}{'mean':>10}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}  (ms/frame)")
+        for stage, s in list(res["stages_ms"].items()) + [("total", res["total_ms"])]:
+            if s:
+                print(f"   {stage:<10}{s['mean']:>10.2f}{s['p50']:>10.2f}{s['p90']:>10.2f}{s['p99']:>10.2f}{s['max']:>10.2f}")
+    print(f"\nPeak RSS: {report['peak_rss_mb']} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the parking engine on the bundled image sets")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--backend", choices=BACKENDS, default="pytorch")
+    parser.add_argument("--int8", action="store_true", help="use the INT8-quantized export of --backend")
+    parser.add_argument("--locations", nargs="+", default=["location_1", "location_2"],
+                        help="image folders next to this script, each with a bounding_boxes_<name>.json")
+    parser.add_argument("--batch", type=int, default=1, help="frames per forward pass")
+    parser.add_argument("--repeat", type=int, default=1, help="passes over each image set")
+    parser.add_argument("--warmup", type=int, default=1, help="unmeasured warm-up batches per location")
+    parser.add_argument("--imgsz", type=int, default=None, help="inference size (default: model's)")
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--output", default=None, help="JSON report path (default: bench_results/<timestamp>.json)")
+    args = parser.parse_args()
+
+    load_start = time.perf_counter()
+    model = load_detector(args.model, args.backend, args.int8, imgsz=args.imgsz or 640)
+    load_seconds = time.perf_counter() - load_start
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "model": os.path.basename(args.model),
+        "model_mtime": os.path.getmtime(args.model) if os.path.exists(args.model) else None,
+        "backend": args.backend + ("-int8" if args.int8 else ""),
+        "model_load_seconds": round(load_seconds, 3),
+        "config": {"batch": args.batch, "repeat": args.repeat, "warmup": args.warmup,
+                   "imgsz": args.imgsz, "conf": args.conf},
+        "platform": {"python": platform.python_version(), "system": platform.platform(),
+                     "opencv": cv2.__version__, "numpy": np.__version__},
+        "locations": {},
+    }
+
+    for location in args.locations:
+        folder = os.path.join(BASE_DIR, location)
+        layout_file = os.path.join(BASE_DIR, f"bounding_boxes_{location}.json")
+        frames = list_frames(folder) if os.path.isdir(folder) else []
+        if not frames or not os.path.exists(layout_file):
+            print(f"⚠️ Skipping {location}: no images in {folder} or no {os.path.basename(layout_file)}")
+            continue
+        print(f"⏱️ Benchmarking {location} ({len(frames)} frames)...")
+        engine = ParkingEngine(model, ParkingLayout(layout_file), conf=args.conf)
+        report["locations"][location] = bench_location(engine, frames, max(1, args.batch), max(1, args.repeat),
+                                                       max(0, args.warmup), args.imgsz)
+
+    report["peak_rss_mb"] = peak_rss_mb()
+    print_report(report)
+
+    output = args.output or os.path.join(BASE_DIR, "bench_results",
+                                         f"parking_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"📝 Report written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Metrics - Hot-path stage timers, counters and gauges with Prometheus text output
+- Histogram per pipeline stage (decode, predict, assign, render, encode, ...), in seconds.
+- Counters, fixed gauges (e.g. model load time) and callback gauges (queue depths read at scrape time).
+- Rolling-window rates (FPS / requests per second) instead of averages since start.
+- render() produces the Prometheus text exposition format, no client library needed.
+- Used by the parking API and, through sys.path, by the LPR app in ../optical character recognition.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Seconds; covers sub-millisecond spot assignment up to multi-second CPU inference
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class RollingRate:
+    """Events per second over the last `window` seconds."""
+
+    def __init__(self, window: float = 10.0):
+        self.window = window
+        self._times = deque()
+        self._first = None
+        self._lock = threading.Lock()
+
+    def tick(self, now: float = None):
+        now = time.time() if now is None else now
+        with self._lock:
+            if self._first is None:
+                self._first = now
+            self._times.append(now)
+            self._trim(now)
+
+    def _trim(self, now):
+        while self._times and now - self._times[0] > self.window:
+            self._times.popleft()
+
+    def rate(self, now: float = None) -> float:
+        now = time.time() if now is None else now
+        with self._lock:
+            self._trim(now)
+            if self._first is None:
+                return 0.0
+            # Until a full window has passed, divide by the time actually observed
+            elapsed = min(self.window, now - self._first)
+            return len(self._times) / elapsed if elapsed > 0 else 0.0
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+class Metrics:
+    """Process-wide metrics, exported as `<namespace>_...` series."""
+
+    def __init__(self, namespace: str, buckets=DEFAULT_BUCKETS, rate_window: float = 10.0):
+        self.namespace = namespace
+        self.buckets = tuple(buckets)
+        self.rate_window = rate_window
+        self._lock = threading.Lock()
+        self._stages = {}    # stage -> _Histogram
+        self._counters = {}  # name -> (value, help)
+        self._gauges = {}    # name -> (value or callable, help)
+        self._rates = {}     # name -> (RollingRate, help)
+        self.started = time.time()
+
+    # --- recording ---
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            hist = self._stages.get(stage)
+            if hist is None:
+                hist = self._stages[stage] = _Histogram(self.buckets)
+            hist.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def inc(self, name: str, amount: float = 1, help: str = ""):
+        with self._lock:
+            value, old_help = self._counters.get(name, (0, help))
+            self._counters[name] = (value + amount, help or old_help)
+
+    def set(self, name: str, value, help: str = ""):
+        """Gauge with a fixed value, or a callable evaluated at scrape time."""
+        with self._lock:
+            self._gauges[name] = (value, help)
+
+    def tick(self, name: str, help: str = ""):
+        """Record one event for the rolling `<name>_per_second` gauge."""
+        with self._lock:
+            if name not in self._rates:
+                self._rates[name] = (RollingRate(self.rate_window), help)
+            rate = self._rates[name][0]
+        rate.tick()
+
+    # --- reading ---
+
+    def rate(self, name: str) -> float:
+        entry = self._rates.get(name)
+        return entry[0].rate() if entry else 0.0
+
+    def counter(self, name: str) -> float:
+        return self._counters.get(name, (0, ""))[0]
+
+    def stage_summary(self):
+        """{stage: {"count", "mean_ms"}} for status endpoints."""
+        with self._lock:
+            return {stage: {"count": h.count, "mean_ms": round(h.sum / h.count * 1000, 3) if h.count else 0.0}
+                    for stage, h in sorted(self._stages.items())}
+
+    @staticmethod
+    def _value(value):
+        try:
+            return float(value() if callable(value) else value)
+        except Exception:
+            return float("nan")
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        ns = self.namespace
+        lines = []
+        with self._lock:
+            stages = {stage: (list(h.counts), h.count, h.sum) for stage, h in self._stages.items()}
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            rates = dict(self._rates)
+
+        lines += [f"# HELP {ns}_stage_seconds Time spent per pipeline stage",
+                  f"# TYPE {ns}_stage_seconds histogram"]
+        for stage, (counts, count, total) in sorted(stages.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f'{ns}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{ns}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'{ns}_stage_seconds_sum{{stage="{stage}"}} {total}')
+            lines.append(f'{ns}_stage_seconds_count{{stage="{stage}"}} {count}')
+
+        for name, (value, help) in sorted(counters.items()):
+            lines += [f"# HELP {ns}_{name}_total {help or name}", f"# TYPE {ns}_{name}_total counter",
+                      f"{ns}_{name}_total {value}"]
+
+        gauges["uptime_seconds"] = (time.time() - self.started, "Seconds since start")
+        for name, (rate, help) in rates.items():
+            gauges[f"{name}_per_second"] = (rate.rate, help or f"{name} per second over the last {self.rate_window:g}s")
+        for name, (value, help) in sorted(gauges.items()):
+            lines += [f"# HELP {ns}_{name} {help or name}", f"# TYPE {ns}_{name} gauge",
+                      f"{ns}_{name} {self._value(value)}"]
+        return "\n".join(lines) + "\n"
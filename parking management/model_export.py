@@ -0,0 +1,193 @@
+"""
+Model Export - CPU-friendly detector backends for the parking and LPR YOLO models
+- pytorch:  the original .pt weights (eager PyTorch).
+- onnx:     ONNX Runtime graph, exported with a dynamic batch axis so micro-batches still work.
+- openvino: OpenVINO IR, usually the fastest option on Intel CPUs.
+- --int8 adds post-training static quantization, calibrated on our own images
+  (location_1/, location_2/ for parking; full camera frames for plates).
+  The detector sees full frames, so calibration skips the LPR debug_capture/ OCR threshold
+  images (*_ocr) and only falls back to plate crops (*_det or tiny images) with a warning.
+
+Exported models are loaded back through ultralytics' YOLO, so predict() returns the same
+Results objects (boxes.xyxy / cls / conf) that ParkingEngine and LPProcessor already read.
+Exports are written next to the .pt file and reused on the next start:
+    visdrone-best.onnx, visdrone-best_int8.onnx,
+    visdrone-best_openvino_model/, visdrone-best_int8_openvino_model/
+
+Optional dependencies: onnx + onnxruntime (onnx), openvino (openvino), nncf (openvino --int8).
+
+Usage:
+    python model_export.py visdrone-best.pt --backend onnx --int8
+    python model_export.py license_plate_detector.pt --backend openvino --int8 --calib path/to/camera_frames
+"""
+import argparse
+import os
+import shutil
+import time
+
+import cv2
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKENDS = ("pytorch", "onnx", "openvino")
+DEFAULT_CALIB_DIRS = [os.path.join(BASE_DIR, "location_1"), os.path.join(BASE_DIR, "location_2")]
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png')
+
+
+def exported_path(model_path: str, backend: str, int8: bool = False) -> str:
+    """Where the export of `model_path` for `backend` lives (a file for onnx, a directory for openvino)."""
+    if backend not in BACKENDS:
+        raise ValueError(f"backend must be one of {', '.join(BACKENDS)}")
+    if backend == "pytorch":
+        return model_path
+    stem = os.path.splitext(model_path)[0] + ("_int8" if int8 else "")
+    return f"{stem}.onnx" if backend == "onnx" else f"{stem}_openvino_model"
+
+
+def letterbox(image, size: int = 640):
+    """Resize keeping aspect ratio and pad to size x size with gray, like ultralytics' LetterBox."""
+    h, w = image.shape[:2]
+    scale = min(size / h, size / w)
+    nh, nw = int(round(h * scale)), int(round(w * scale))
+    resized = cv2.resize(image, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    top, left = (size - nh) // 2, (size - nw) // 2
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    canvas[top:top + nh, left:left + nw] = resized
+    return canvas
+
+
+def _model_input(image, imgsz):
+    rgb = cv2.cvtColor(letterbox(image, imgsz), cv2.COLOR_BGR2RGB)
+    return np.ascontiguousarray(rgb.transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+
+
+def calibration_images(dirs, imgsz: int = 640, limit: int = 300):
+    """Model inputs (1x3xHxW float32, RGB, 0..1) for up to `limit` full frames from `dirs`.
+
+    OCR threshold images (*_ocr) are skipped. Plate crops (*_det, or a short side under
+    imgsz / 4) are only used, with a warning, when no full frame was found.
+    """
+    paths = []
+    for d in dirs:
+        paths += sorted(os.path.join(d, f) for f in os.listdir(d)
+                        if f.lower().endswith(IMAGE_EXTS) and not os.path.splitext(f)[0].endswith("_ocr"))
+    if not paths:
+        raise ValueError(f"No calibration images found in {', '.join(dirs)}")
+    # Spread the sample over the whole set rather than taking the first frames only
+    step = max(1, len(paths) // limit)
+    samples, crops = [], []
+    for path in paths[::step][:limit]:
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        if os.path.splitext(path)[0].endswith("_det") or min(image.shape[:2]) < imgsz // 4:
+            crops.append(image)
+            continue
+        samples.append(_model_input(image, imgsz))
+    if not samples and crops:
+        print(f"⚠️ Only plate crops found in {', '.join(dirs)}; INT8 ranges calibrated on crops "
+              "may not fit the full frames the detector sees")
+        samples = [_model_input(image, imgsz) for image in crops]
+    return samples
+
+
+def _quantize_onnx(fp32_path, int8_path, samples):
+    try:
+        from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType,
+                                              quantize_static)
+    except ImportError:
+        raise ImportError("ONNX INT8 export needs onnxruntime (pip install onnxruntime)")
+    import onnx
+
+    input_name = onnx.load(fp32_path, load_external_data=False).graph.input[0].name
+
+    class Reader(CalibrationDataReader):
+        def __init__(self):
+            self._it = iter({input_name: s} for s in samples)
+
+        def get_next(self):
+            return next(self._it, None)
+
+    # QDQ with per-channel weights keeps YOLO's accuracy closest to FP32 on CPU
+    quantize_static(fp32_path, int8_path, Reader(), quant_format=QuantFormat.QDQ, per_channel=True,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    return int8_path
+
+
+def _quantize_openvino(fp32_dir, int8_dir, samples):
+    try:
+        import nncf
+        import openvino as ov
+    except ImportError:
+        raise ImportError("OpenVINO INT8 export needs openvino and nncf (pip install openvino nncf)")
+
+    xml = next(f for f in os.listdir(fp32_dir) if f.endswith(".xml"))
+    core = ov.Core()
+    quantized = nncf.quantize(core.read_model(os.path.join(fp32_dir, xml)), nncf.Dataset(samples),
+                              preset=nncf.QuantizationPreset.MIXED, subset_size=len(samples))
+    os.makedirs(int8_dir, exist_ok=True)
+    ov.save_model(quantized, os.path.join(int8_dir, xml))
+    # ultralytics reads names / imgsz / task from metadata.yaml next to the IR
+    metadata = os.path.join(fp32_dir, "metadata.yaml")
+    if os.path.exists(metadata):
+        shutil.copy(metadata, int8_dir)
+    return int8_dir
+
+
+def export_model(model_path: str, backend: str, int8: bool = False, calib_dirs=None, imgsz: int = 640,
+                 calib_limit: int = 300) -> str:
+    """Exports `model_path` for `backend` (INT8-quantized if asked) and returns the exported path."""
+    from ultralytics import YOLO
+
+    if backend == "pytorch":
+        return model_path
+    target = exported_path(model_path, backend, int8)
+    fp32 = exported_path(model_path, backend)
+
+    if not os.path.exists(fp32):
+        print(f"📦 Exporting {os.path.basename(model_path)} to {backend}...")
+        # Dynamic batch axis: the API and batch CLI send several frames per forward pass
+        produced = YOLO(model_path).export(format=backend, imgsz=imgsz, dynamic=True, half=False)
+        if os.path.abspath(produced) != os.path.abspath(fp32):
+            shutil.move(produced, fp32)
+    if not int8:
+        return fp32
+
+    samples = calibration_images(calib_dirs or DEFAULT_CALIB_DIRS, imgsz, calib_limit)
+    print(f"🧮 Quantizing {os.path.basename(fp32)} to INT8 on {len(samples)} calibration images...")
+    if backend == "onnx":
+        return _quantize_onnx(fp32, target, samples)
+    return _quantize_openvino(fp32, target, samples)
+
+
+def load_detector(model_path: str, backend: str = "pytorch", int8: bool = False, export_missing: bool = True,
+                  **export_kwargs):
+    """YOLO model for `backend`, exporting it first if the export does not exist yet."""
+    from ultralytics import YOLO
+
+    path = exported_path(model_path, backend, int8)
+    if backend != "pytorch" and not os.path.exists(path):
+        if not export_missing:
+            raise FileNotFoundError(f"{path} not found; run model_export.py {model_path} --backend {backend}"
+                                    + (" --int8" if int8 else ""))
+        path = export_model(model_path, backend, int8, **export_kwargs)
+    return YOLO(path, task="detect")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a YOLO .pt model to ONNX Runtime / OpenVINO, optionally INT8")
+    parser.add_argument("model", help=".pt weights (visdrone-best.pt, license_plate_detector.pt, ...)")
+    parser.add_argument("--backend", choices=BACKENDS[1:], default="onnx")
+    parser.add_argument("--int8", action="store_true", help="post-training static INT8 quantization")
+    parser.add_argument("--calib", nargs="+", default=DEFAULT_CALIB_DIRS, help="folders of calibration images")
+    parser.add_argument("--calib-limit", type=int, default=300)
+    parser.add_argument("--imgsz", type=int, default=640)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    path = export_model(args.model, args.backend, args.int8, args.calib, args.imgsz, args.calib_limit)
+    print(f"✅ {path} ready in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,184 @@
 import cv2
 import os
 import json
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 import numpy as np
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query
+from fastapi.responses import JSONResponse, FileResponse, Response, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from ultralytics import solutions
+from starlette.concurrency import run_in_threadpool
 import base64
 from io import BytesIO
 from PIL import Image
 
-app = FastAPI(title="Parking Detection API")
+from parking_engine import ParkingRegistry, discover_layouts
+from stream_pipeline import ArtifactWriter
+from metrics import Metrics
+from result_cache import ResultCache, file_version
+from model_export import BACKENDS, exported_path, load_detector
+
+# Initialize result folder
+RESULT_FOLDER = "parking_results"
+os.makedirs(RESULT_FOLDER, exist_ok=True)
+
+MODEL_PATH = r"C:\Users\Fauzi.HEC\Desktop\Hackaton\parking_management\visdrone-best.pt"
+# Detector backend: pytorch (the .pt as is), onnx or openvino; PARKING_INT8=True loads the INT8 export.
+# Missing exports are created next to MODEL_PATH on first start (see model_export.py).
+MODEL_BACKEND = os.getenv('PARKING_BACKEND', "pytorch")
+MODEL_INT8 = os.getenv('PARKING_INT8', 'False') == 'True'
+if MODEL_BACKEND not in BACKENDS:
+    raise ValueError(f"PARKING_BACKEND must be one of {', '.join(BACKENDS)}")
+# Every bounding_boxes_<location>.json in this folder is served as /api/parking/<location>/...
+LAYOUT_DIR = os.getenv('PARKING_LAYOUT_DIR', r"C:\Users\Fauzi.HEC\Desktop\Hackaton\parking_management")
+DEFAULT_LOCATION = os.getenv('PARKING_DEFAULT_LOCATION', "location_1")
+
+# Response formats of /detect:
+# - json:      stats + base64 data URI of the result image (default, backwards compatible)
+# - stats:     stats only, no image in the response
+# - image:     raw JPEG body, stats in the X-Parking-Stats header
+# - reference: stats + result_url to fetch the image from /api/parking/result/{filename}
+RESPONSE_FORMATS = ("json", "stats", "image", "reference")
+SAVE_RESULTS = os.getenv('SAVE_RESULTS', 'True') == 'True'
+# Result images are encoded/written by a background writer; when its queue is full the
+# policy (drop_oldest, drop_newest or block) decides what happens to new results
+WRITER_QUEUE_SIZE = int(os.getenv('WRITER_QUEUE_SIZE', 64))
+WRITER_POLICY = os.getenv('WRITER_POLICY', "drop_oldest")
+
+# Cache of results for re-posted identical snapshots
+RESULT_CACHE_MB = float(os.getenv('RESULT_CACHE_MB', 64))
+RESULT_CACHE_ENTRIES = int(os.getenv('RESULT_CACHE_ENTRIES', 1024))
+
+# Spot state hysteresis: consecutive frames needed to mark a spot occupied / free
+SPOT_ON_FRAMES = int(os.getenv('SPOT_ON_FRAMES', 2))
+SPOT_OFF_FRAMES = int(os.getenv('SPOT_OFF_FRAMES', 3))
+
+# Micro-batching: concurrent uploads are grouped into one YOLO forward pass
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', 8))
+MAX_BATCH_WAIT_MS = float(os.getenv('MAX_BATCH_WAIT_MS', 10))
+
+
+class MicroBatcher:
+    """Gathers concurrent requests and runs them through `process_batch` together.
+
+    A batch is dispatched as soon as it holds `max_batch_size` images or the oldest
+    request has waited `max_wait_ms`. Inference runs on a single worker thread so the
+    event loop stays free to accept uploads while the model is busy.
+    """
+
+    def __init__(self, process_batch, max_batch_size: int = 8, max_wait_ms: float = 10.0):
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue = None
+        self._task = None
+        self._executor = None
+        self._current = []  # (item, future) pairs taken off the queue and not answered yet
+
+    async def start(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="parking-infer")
+        self.queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stops batching and fails every request that is still queued or in flight."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        pending = self._current
+        self._current = []
+        while not self.queue.empty():
+            pending.append(self.queue.get_nowait())
+        for _, fut in pending:
+            if not fut.done():
+                fut.set_exception(RuntimeError("Parking detector is shutting down"))
+        self._executor.shutdown(wait=False)
+
+    async def submit(self, item):
+        """Queue one item and wait for its own result."""
+        if self._task is None:
+            raise RuntimeError("Parking detector is not running")
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+
+    async def _collect(self):
+        # Items go straight into _current so stop() can fail them even mid-collection
+        loop = asyncio.get_running_loop()
+        items = self._current = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(items) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                items.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return items
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = await self._collect()
+            # Drop requests whose client already went away
+            items = self._current = [(item, fut) for item, fut in items if not fut.done()]
+            if not items:
+                continue
+            METRICS.inc("batches", help="YOLO forward passes")
+            METRICS.inc("batched_images", len(items), help="Images run through YOLO")
+            try:
+                results = await loop.run_in_executor(self._executor, self.process_batch, [item for item, _ in items])
+            except Exception as e:
+                for _, fut in items:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            for (_, fut), result in zip(items, results):
+                if not fut.done():
+                    fut.set_result(result)
+            self._current = []
+
+
+# Stage timers (decode, predict, assign, render, encode), counters and gauges, served on /metrics
+METRICS = Metrics("parking")
+
+# Initialize Parking Registry (one shared model, one layout per location)
+_load_start = time.perf_counter()
+model = load_detector(MODEL_PATH, MODEL_BACKEND, MODEL_INT8)
+MODEL_LOAD_SECONDS = time.perf_counter() - _load_start
+registry = ParkingRegistry(model, discover_layouts(LAYOUT_DIR),
+                           on_frames=SPOT_ON_FRAMES, off_frames=SPOT_OFF_FRAMES, metrics=METRICS)
+print(f"Serving parking locations: {', '.join(registry.names())} "
+      f"({MODEL_BACKEND}{' int8' if MODEL_INT8 else ''} model loaded in {MODEL_LOAD_SECONDS:.1f}s)")
+batcher = MicroBatcher(registry.process, MAX_BATCH_SIZE, MAX_BATCH_WAIT_MS)
+result_cache = ResultCache(int(RESULT_CACHE_MB * 1024 * 1024), RESULT_CACHE_ENTRIES)
+writer = ArtifactWriter(WRITER_QUEUE_SIZE, WRITER_POLICY)
+MODEL_VERSION = file_version(exported_path(MODEL_PATH, MODEL_BACKEND, MODEL_INT8))
+
+METRICS.set("model_load_seconds", MODEL_LOAD_SECONDS, "Time to load the YOLO weights")
+METRICS.set("batch_queue_depth", lambda: batcher.queue.qsize() if batcher.queue else 0, "Requests waiting for a batch")
+METRICS.set("writer_queue_depth", lambda: writer.stats()["queued"], "Result images waiting to be written")
+METRICS.set("writer_dropped", lambda: writer.stats()["dropped"], "Result images dropped by the writer policy")
+METRICS.set("cache_entries", lambda: result_cache.stats()["entries"], "Cached detect results")
+METRICS.set("cache_hit_rate", lambda: result_cache.stats()["hit_rate"], "Result cache hit rate")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await batcher.start()
+    yield
+    await batcher.stop()
+    await run_in_threadpool(writer.close)
+
+
+app = FastAPI(title="Parking Detection API", lifespan=lifespan)
 
 # Enable CORS for JavaScript integration
 app.add_middleware(
@@ -21,94 +189,214 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize result folder
-RESULT_FOLDER = "parking_results"
-os.makedirs(RESULT_FOLDER, exist_ok=True)
 
-# Initialize Parking Manager
-parkingmanager = solutions.ParkingManagement(
-    model=r"C:\Users\Fauzi.HEC\Desktop\Hackaton\parking_management\visdrone-best.pt",
-    json_file=r"C:\Users\Fauzi.HEC\Desktop\Hackaton\parking_management\bounding_boxes_location_1.json",
-)
+def decode_image(content: bytes):
+    with METRICS.timer("decode"):
+        nparr = np.frombuffer(content, np.uint8)
+        return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+
+def encode_jpeg(plot_im):
+    with METRICS.timer("encode"):
+        ret, buffer = cv2.imencode('.jpg', plot_im)
+    if not ret:
+        raise RuntimeError("Failed to encode result image")
+    return buffer.tobytes()
+
+
+# Encoded results whose background disk write has not finished yet, by filename
+pending_results = {}
+
+
+def save_result(filename, image, cache_key=None, cached=None, save=True):
+    """Hand a result image to the background writer. `image` is JPEG bytes or the plot array.
+
+    A plot array is encoded by the writer; with `cache_key` the encoded bytes are then cached.
+    Until the file is on disk it is served from `pending_results`.
+    """
+    if isinstance(image, bytes):
+        pending_results[filename] = image
+
+    def on_done(jpeg):
+        if jpeg is not None and cache_key is not None:
+            result_cache.put(cache_key, dict(cached, jpeg=jpeg), len(jpeg))
+        pending_results.pop(filename, None)
+
+    path = os.path.join(RESULT_FOLDER, filename) if save else None
+    return writer.submit(path, image, on_done=on_done)
+
+def check_location(location: str):
+    if location not in registry:
+        raise HTTPException(status_code=404, detail=f"Unknown location: {location}")
+
 
 @app.post("/api/parking/detect")
-async def detect_parking(file: UploadFile = File(...)):
+async def detect_parking_default(file: UploadFile = File(...), response_format: str = Query("json")):
+    """Process uploaded image for the default location"""
+    return await detect_parking(DEFAULT_LOCATION, file, response_format)
+
+@app.post("/api/parking/{location}/detect")
+async def detect_parking(location: str, file: UploadFile = File(...), response_format: str = Query("json")):
     """Process uploaded image and return parking detection results"""
+    check_location(location)
+    if response_format not in RESPONSE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"response_format must be one of {', '.join(RESPONSE_FORMATS)}")
+    METRICS.tick("requests", "Detect requests per second over the last 10s")
+    METRICS.inc("requests", help="Detect requests")
     try:
         # Read uploaded image
         content = await file.read()
-        nparr = np.frombuffer(content, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if image is None:
-            raise HTTPException(status_code=400, detail="Invalid image format")
-        
-        # Process image
-        results = parkingmanager(image)
-        
-        # Get parking stats
-        occupied = parkingmanager.pr_info["Occupancy"]
-        available = parkingmanager.pr_info["Available"]
-        total = occupied + available
-        
-        # Save result image
-        filename = f"parking_result_{file.filename}"
-        result_path = os.path.join(RESULT_FOLDER, filename)
-        cv2.imwrite(result_path, results.plot_im)
-        
-        # Convert result image to base64 for JavaScript
-        _, buffer = cv2.imencode('.jpg', results.plot_im)
-        img_base64 = base64.b64encode(buffer).decode('utf-8')
-        
-        return JSONResponse({
-            "success": True,
-            "data": {
+        filename = f"parking_result_{location}_{file.filename}"
+        cache_key = result_cache.key(content, MODEL_VERSION, registry.engines[location].layout.version)
+
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            # Same snapshot as before: reuse its result without running YOLO again
+            METRICS.inc("cache_hits", help="Detect requests answered from the result cache")
+            registry.record(location, cached["spot_occupied"])
+            jpeg = cached["jpeg"]
+            data = dict(cached["data"], filename=filename, cached=True)
+        else:
+            image = await run_in_threadpool(decode_image, content)
+            
+            if image is None:
+                raise HTTPException(status_code=400, detail="Invalid image format")
+            
+            # Process image (batched with other concurrent requests)
+            results = await batcher.submit((location, image))
+            
+            # Get parking stats
+            occupied = results.occupied
+            available = results.available
+            total = occupied + available
+            data = {
+                "location": location,
                 "occupied": occupied,
                 "available": available,
                 "total": total,
                 "occupancy_rate": round((occupied / total * 100), 1) if total > 0 else 0,
-                "result_image": f"data:image/jpeg;base64,{img_base64}",
                 "filename": filename
             }
-        })
+            # Copy: result_url / result_image are added to `data` below and must not end up in the cache
+            to_cache = {"data": dict(data), "spot_occupied": results.spot_box >= 0}
+
+            if response_format == "stats":
+                # No image in the response: the writer encodes, caches and saves it
+                await run_in_threadpool(save_result, filename, results.plot_im,
+                                        cache_key=cache_key, cached=to_cache, save=SAVE_RESULTS)
+                return JSONResponse({"success": True, "data": data})
+
+            # Encode once; the same bytes go to the response, the cache and disk
+            jpeg = await run_in_threadpool(encode_jpeg, results.plot_im)
+            result_cache.put(cache_key, dict(to_cache, jpeg=jpeg), len(jpeg))
+
+        if SAVE_RESULTS or response_format == "reference":
+            await run_in_threadpool(save_result, filename, jpeg)
+
+        if response_format == "stats":
+            return JSONResponse({"success": True, "data": data})
+
+        if response_format == "image":
+            return Response(jpeg, media_type="image/jpeg", headers={"X-Parking-Stats": json.dumps(data)})
+
+        if response_format == "reference":
+            data["result_url"] = f"/api/parking/result/{filename}"
+        else:
+            data["result_image"] = f"data:image/jpeg;base64,{base64.b64encode(jpeg).decode('utf-8')}"
+        return JSONResponse({"success": True, "data": data})
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/parking/result/{filename}")
 async def get_result_image(filename: str):
     """Serve result image file"""
+    jpeg = pending_results.get(filename)
+    if jpeg is not None:
+        return Response(jpeg, media_type="image/jpeg")
     file_path = os.path.join(RESULT_FOLDER, filename)
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="File not found")
     return FileResponse(file_path, media_type="image/jpeg")
 
+@app.get("/api/parking/cache")
+def get_cache_stats():
+    """Result cache hit/miss counters and size"""
+    return result_cache.stats()
+
+@app.get("/api/parking/writer")
+def get_writer_stats():
+    """Background result writer queue depth and written/dropped/failed counters"""
+    return writer.stats()
+
 @app.get("/api/parking/status")
 async def get_parking_status():
-    """Get current parking status"""
+    """Get current parking status: model, queues, throughput and per-stage timings"""
     return JSONResponse({
-        "location": "Location 1",
-        "status": "active",
-        "model_loaded": True
+        "location": DEFAULT_LOCATION,
+        "locations": registry.names(),
+        "status": "active" if batcher.queue is not None else "starting",
+        "model_loaded": registry.model is not None,
+        "model": os.path.basename(MODEL_PATH),
+        "backend": MODEL_BACKEND + ("-int8" if MODEL_INT8 else ""),
+        "model_load_seconds": round(MODEL_LOAD_SECONDS, 3),
+        "uptime_seconds": round(time.time() - METRICS.started, 1),
+        "requests_per_second": round(METRICS.rate("requests"), 2),
+        "requests": METRICS.counter("requests"),
+        "batch_queue_depth": batcher.queue.qsize() if batcher.queue else 0,
+        "writer": writer.stats(),
+        "cache": result_cache.stats(),
+        "stages_ms": METRICS.stage_summary(),
     })
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/parking/locations")
+def get_parking_locations():
+    """List the locations served by this process"""
+    return {"locations": registry.names()}
+
 @app.get("/api/parking/stats")
-def get_parking_stats():
+def get_parking_stats_default():
+    """Get current parking statistics for the default location"""
+    return get_parking_stats(DEFAULT_LOCATION)
+
+@app.get("/api/parking/{location}/stats")
+def get_parking_stats(location: str):
     """Get current parking statistics"""
-    if not hasattr(parkingmanager, 'pr_info') or not parkingmanager.pr_info:
-        return {"total": 0, "occupied": 0, "available": 0, "occupancy_rate": 0}
+    check_location(location)
+    pr_info = registry.pr_info[location]
+    if not pr_info:
+        return {"location": location, "total": 0, "occupied": 0, "available": 0, "occupancy_rate": 0}
     
-    occupied = parkingmanager.pr_info.get("Occupancy", 0)
-    available = parkingmanager.pr_info.get("Available", 0)
+    occupied = pr_info.get("Occupancy", 0)
+    available = pr_info.get("Available", 0)
     total = occupied + available
     
     return {
+        "location": location,
         "total": total,
         "occupied": occupied,
         "available": available,
         "occupancy_rate": round((occupied / total * 100), 1) if total > 0 else 0
     }
 
+@app.get("/api/parking/spots")
+def get_parking_spots_default():
+    """Get per-spot occupancy state for the default location"""
+    return get_parking_spots(DEFAULT_LOCATION)
+
+@app.get("/api/parking/{location}/spots")
+def get_parking_spots(location: str):
+    """Get per-spot occupancy state and dwell times"""
+    check_location(location)
+    return {"location": location, "spots": registry.snapshot(location)}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
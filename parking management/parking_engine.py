@@ -0,0 +1,436 @@
+"""
+Parking Engine - Shared detection, spot assignment and rendering
+- Loads the same layout JSON files used by ultralytics' ParkingManagement.
+- Runs YOLO on a whole batch of frames in one forward pass.
+- Serves many locations (one layout each) from a single shared model.
+- Tracks per-spot occupancy state and dwell times across frames.
+- Re-detects only the spots whose pixels changed since their last confirmed state.
+- Reproduces the ParkingManagement overlay so results look the same as before.
+- Optionally times the predict / assign / render stages into a metrics.Metrics object.
+"""
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+# Same colors as ultralytics.solutions.ParkingManagement
+AVAILABLE_COLOR = (0, 0, 255)
+OCCUPIED_COLOR = (0, 255, 0)
+LABEL_BG_COLOR = (104, 31, 17)
+LABEL_TXT_COLOR = (255, 255, 255)
+
+
+class ParkingLayout:
+    """Parking spot polygons loaded from a bounding_boxes_location_*.json file.
+
+    The polygons are rasterized once into a label map (pixel -> spot id, -1 outside every
+    spot), so assigning detections to spots is a single array lookup per frame instead of
+    a point-in-polygon test for every (spot, box) pair.
+    """
+
+    def __init__(self, json_file):
+        self.json_file = json_file
+        with open(json_file, 'rb') as f:
+            raw = f.read()
+        self.regions = json.loads(raw)
+        self.version = hashlib.sha1(raw).hexdigest()[:12]  # changes whenever the layout file is edited
+        self.polygons = [np.array(r["points"], dtype=np.int32).reshape((-1, 1, 2)) for r in self.regions]
+        self.label_map = self._compile_label_map()
+
+    def __len__(self):
+        return len(self.polygons)
+
+    def _compile_label_map(self):
+        if not self.polygons:
+            return np.full((1, 1), -1, dtype=np.int16)
+
+        all_pts = np.concatenate(self.polygons).reshape(-1, 2)
+        width, height = int(all_pts[:, 0].max()) + 1, int(all_pts[:, 1].max()) + 1
+        dtype = np.int16 if len(self.polygons) < np.iinfo(np.int16).max else np.int32
+        label_map = np.full((height, width), -1, dtype=dtype)
+
+        # Fill in reverse so that, where spots overlap, the first spot in the JSON wins
+        for spot_id in range(len(self.polygons) - 1, -1, -1):
+            pts = self.polygons[spot_id]
+            x, y, w, h = cv2.boundingRect(pts)
+            local = pts - np.array([x, y], dtype=np.int32)
+            mask = np.zeros((h, w), dtype=np.uint8)
+            cv2.fillPoly(mask, [local], 1)
+
+            # Rasterized edges overshoot the exact polygon; keep only the edge pixels
+            # that cv2.pointPolygonTest (what ParkingManagement uses) counts as inside.
+            edge = np.zeros_like(mask)
+            cv2.polylines(edge, [local], isClosed=True, color=1, thickness=1)
+            for ey, ex in zip(*np.nonzero(edge & mask)):
+                if cv2.pointPolygonTest(local, (int(ex), int(ey)), False) < 0:
+                    mask[ey, ex] = 0
+
+            label_map[y:y + h, x:x + w][mask.astype(bool)] = spot_id
+        return label_map
+
+    def assign(self, boxes: np.ndarray) -> np.ndarray:
+        """Return, for every spot, the index of the first box whose center lies inside it (-1 if free)."""
+        n_spots, n_boxes = len(self.polygons), len(boxes)
+        if n_boxes == 0:
+            return np.full(n_spots, -1, dtype=np.int32)
+
+        xc = ((boxes[:, 0] + boxes[:, 2]) / 2).astype(int)
+        yc = ((boxes[:, 1] + boxes[:, 3]) / 2).astype(int)
+        height, width = self.label_map.shape
+        inside = (xc >= 0) & (xc < width) & (yc >= 0) & (yc < height)
+
+        labels = np.full(n_boxes, -1, dtype=np.int32)
+        labels[inside] = self.label_map[yc[inside], xc[inside]]
+        hit = labels >= 0
+
+        # Lowest box index per spot, matching the detection order ParkingManagement used
+        first_box = np.full(n_spots, n_boxes, dtype=np.int32)
+        np.minimum.at(first_box, labels[hit], np.nonzero(hit)[0].astype(np.int32))
+        return np.where(first_box < n_boxes, first_box, -1).astype(np.int32)
+
+
+@dataclass
+class ParkingResult:
+    """Per-frame output, mirroring what ParkingManagement exposes via pr_info / plot_im."""
+    plot_im: np.ndarray
+    occupied: int
+    available: int
+    spot_box: np.ndarray
+    boxes: np.ndarray = field(default_factory=lambda: np.zeros((0, 4), dtype=np.float32))
+    clss: np.ndarray = field(default_factory=lambda: np.zeros((0,), dtype=np.int32))
+
+    @property
+    def total(self):
+        return self.occupied + self.available
+
+    @property
+    def pr_info(self):
+        return {"Occupancy": self.occupied, "Available": self.available}
+
+
+class ParkingEngine:
+    """Runs a YOLO model over a batch of frames and maps detections onto a ParkingLayout."""
+
+    def __init__(self, model, layout: ParkingLayout, conf: float = 0.25, line_width: int = 2, metrics=None):
+        self.model = model
+        self.layout = layout
+        self.conf = conf
+        self.line_width = line_width
+        self.metrics = metrics  # optional metrics.Metrics; stages: predict, assign, render
+
+    def predict(self, images: List[np.ndarray], imgsz: int = None):
+        """One batched forward pass. Returns a list of (boxes xyxy, class ids) per image."""
+        with stage_timer(self.metrics, "predict"):
+            return predict_batch(self.model, images, self.conf, imgsz)
+
+    def process(self, images: List[np.ndarray]) -> List[ParkingResult]:
+        """Detect, assign spots and render every image of the batch."""
+        return [self.finish(im0, boxes, clss) for im0, (boxes, clss) in zip(images, self.predict(images))]
+
+    def finish(self, im0, boxes, clss) -> ParkingResult:
+        """Spot assignment and rendering for one frame whose detections are already known."""
+        with stage_timer(self.metrics, "assign"):
+            spot_box = self.layout.assign(boxes)
+        with stage_timer(self.metrics, "render"):
+            return self.render(im0, spot_box, boxes, clss)
+
+    def render(self, im0, spot_box, boxes, clss) -> ParkingResult:
+        """Draw spot polygons, labels of the cars occupying them and the occupancy summary."""
+        names = self.model.names
+        occupied = int((spot_box >= 0).sum())
+        available = len(spot_box) - occupied
+
+        for pts, box_id in zip(self.layout.polygons, spot_box):
+            if box_id >= 0:
+                x1, y1, x2, y2 = boxes[box_id]
+                xc, yc = int((x1 + x2) / 2), int((y1 + y2) / 2)
+                draw_center_label(im0, names[int(clss[box_id])], xc, yc)
+            cv2.polylines(im0, [pts], isClosed=True, color=OCCUPIED_COLOR if box_id >= 0 else AVAILABLE_COLOR,
+                          thickness=self.line_width)
+
+        draw_analytics(im0, {"Occupancy": occupied, "Available": available})
+        return ParkingResult(plot_im=im0, occupied=occupied, available=available,
+                             spot_box=spot_box, boxes=boxes, clss=clss)
+
+
+class SpotTracker:
+    """Per-spot occupied/free state with hysteresis, one array slot per polygon of a layout.
+
+    A spot only switches state after `on_frames` consecutive occupied observations (or
+    `off_frames` consecutive free ones), so a single missed or spurious detection does not
+    reset its dwell time. All spots are updated together with NumPy on every frame.
+    """
+
+    def __init__(self, n_spots: int, on_frames: int = 2, off_frames: int = 3):
+        self.n_spots = n_spots
+        self.on_frames = max(1, on_frames)
+        self.off_frames = max(1, off_frames)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.occupied = np.zeros(self.n_spots, dtype=bool)
+            self.since = np.full(self.n_spots, np.nan)          # when the current state started
+            self.pending = np.zeros(self.n_spots, dtype=np.int32)  # consecutive frames disagreeing with the state
+            self.pending_since = np.full(self.n_spots, np.nan)  # first of those frames
+
+    def update(self, observed: np.ndarray, now: float = None):
+        """Feed one frame of raw per-spot occupancy. Returns (entered, left) spot ids."""
+        now = time.time() if now is None else now
+        observed = np.asarray(observed, dtype=bool)
+        with self.lock:
+            disagree = observed != self.occupied
+            started = disagree & (self.pending == 0)
+            self.pending_since[started] = now
+            self.pending = np.where(disagree, self.pending + 1, 0)
+
+            entered = disagree & ~self.occupied & (self.pending >= self.on_frames)
+            left = disagree & self.occupied & (self.pending >= self.off_frames)
+            flipped = entered | left
+
+            self.occupied[flipped] = ~self.occupied[flipped]
+            self.since[flipped] = self.pending_since[flipped]
+            self.pending[flipped] = 0
+            return np.nonzero(entered)[0], np.nonzero(left)[0]
+
+    def dwell(self, now: float = None) -> np.ndarray:
+        """Seconds each spot has been occupied (0 for free spots)."""
+        now = time.time() if now is None else now
+        with self.lock:
+            return np.where(self.occupied, now - np.nan_to_num(self.since, nan=now), 0.0)
+
+    def snapshot(self, now: float = None):
+        """Per-spot state as plain dicts, for JSON responses."""
+        now = time.time() if now is None else now
+        dwell = self.dwell(now)
+        with self.lock:
+            return [
+                {
+                    "spot": int(i) + 1,
+                    "occupied": bool(self.occupied[i]),
+                    "since": None if np.isnan(self.since[i]) else float(self.since[i]),
+                    "dwell_seconds": round(float(dwell[i]), 1),
+                }
+                for i in range(self.n_spots)
+            ]
+
+
+def format_dwell(seconds: float) -> str:
+    """HH:MM, as shown on the live overlay."""
+    hours, minutes = int(seconds // 3600), int((seconds % 3600) // 60)
+    return f"{hours:02d}:{minutes:02d}"
+
+
+class IncrementalParking:
+    """Per-spot change detection on top of a ParkingEngine, for fixed cameras.
+
+    Every frame, each spot gets a cheap signature (mean intensity and mean gradient
+    magnitude over its polygon mask, computed for all spots at once with np.bincount on
+    the layout label map). Only spots whose signature moved away from their last
+    confirmed state are "dirty"; YOLO then runs on the bounding region of the dirty spots
+    alone, at the same scale as a full-frame pass, and clean spots keep their cached
+    occupancy. A full-frame pass still happens every `refresh_interval` seconds, when
+    more than `full_frame_ratio` of the spots are dirty, or when the caller passes force=True.
+    """
+
+    def __init__(self, engine: ParkingEngine, mean_threshold: float = 12.0, grad_threshold: float = 8.0,
+                 pad: int = 24, full_frame_ratio: float = 0.5, refresh_interval: float = 30.0, imgsz: int = 640):
+        self.engine = engine
+        self.layout = engine.layout
+        self.thresholds = np.array([mean_threshold, grad_threshold])
+        self.pad = pad
+        self.full_frame_ratio = full_frame_ratio
+        self.refresh_interval = refresh_interval
+        self.imgsz = imgsz
+
+        n = len(self.layout)
+        self.spot_rects = np.array([cv2.boundingRect(pts) for pts in self.layout.polygons], dtype=np.int32).reshape(-1, 4)
+        self.reference = None                      # (n, 2) signatures of the last confirmed state
+        self.spot_xyxy = np.full((n, 4), np.nan, dtype=np.float32)  # box occupying each spot, NaN if free
+        self.spot_cls = np.zeros(n, dtype=np.int32)
+        self.last_full = 0.0
+        self._shape = None
+
+        self.full_runs = 0
+        self.crop_runs = 0
+        self.reused = 0
+        self.dirty_spots = 0
+
+    def _prepare(self, shape):
+        """Flat pixel indices / spot labels of the label map, cached per frame size."""
+        h, w = shape
+        lh, lw = self.layout.label_map.shape
+        labels = np.full((h, w), -1, dtype=np.int32)
+        labels[:min(h, lh), :min(w, lw)] = self.layout.label_map[:h, :w]
+        flat = labels.ravel()
+        self._idx = np.flatnonzero(flat >= 0)
+        self._labels = flat[self._idx]
+        self._counts = np.maximum(np.bincount(self._labels, minlength=len(self.layout)), 1)
+        self._shape = shape
+
+    def signatures(self, frame) -> np.ndarray:
+        """(n_spots, 2) array of mean intensity and mean gradient magnitude per spot."""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        if self._shape != gray.shape:
+            self._prepare(gray.shape)
+        grad = cv2.magnitude(cv2.Sobel(gray, cv2.CV_32F, 1, 0), cv2.Sobel(gray, cv2.CV_32F, 0, 1))
+
+        n = len(self.layout)
+        mean = np.bincount(self._labels, weights=gray.ravel()[self._idx], minlength=n) / self._counts
+        edges = np.bincount(self._labels, weights=grad.ravel()[self._idx], minlength=n) / self._counts
+        return np.stack((mean, edges), axis=1)
+
+    def process(self, frame, now: float = None, force: bool = False) -> ParkingResult:
+        now = time.time() if now is None else now
+        signature = self.signatures(frame)
+
+        if force or self.reference is None or now - self.last_full >= self.refresh_interval:
+            dirty = np.ones(len(self.layout), dtype=bool)
+        else:
+            dirty = (np.abs(signature - self.reference) > self.thresholds).any(axis=1)
+
+        if not dirty.any():
+            self.reused += 1
+            return self.render_cached(frame)
+
+        self.dirty_spots += int(dirty.sum())
+        if dirty.mean() > self.full_frame_ratio:
+            boxes, clss = self.engine.predict([frame])[0]
+            self.last_full = now
+            self.full_runs += 1
+        else:
+            boxes, clss = self._predict_region(frame, dirty)
+            self.crop_runs += 1
+
+        spot_box = self.layout.assign(boxes)
+        hit = dirty & (spot_box >= 0)
+        self.spot_xyxy[dirty] = np.nan
+        self.spot_xyxy[hit] = boxes[spot_box[hit]]
+        self.spot_cls[hit] = clss[spot_box[hit]]
+        self.reference = signature if self.reference is None else np.where(dirty[:, None], signature, self.reference)
+        return self.render_cached(frame)
+
+    def _predict_region(self, frame, dirty):
+        """YOLO on the padded union of the dirty spots' bounding rects, boxes mapped back to frame coordinates."""
+        h, w = frame.shape[:2]
+        rects = self.spot_rects[dirty]
+        x1 = max(0, int(rects[:, 0].min()) - self.pad)
+        y1 = max(0, int(rects[:, 1].min()) - self.pad)
+        x2 = min(w, int((rects[:, 0] + rects[:, 2]).max()) + self.pad)
+        y2 = min(h, int((rects[:, 1] + rects[:, 3]).max()) + self.pad)
+
+        # Keep the crop at the scale a full-frame pass would use, so small crops run small
+        scale = self.imgsz / max(h, w)
+        imgsz = max(64, int(np.ceil(max(x2 - x1, y2 - y1) * scale / 32)) * 32)
+        boxes, clss = self.engine.predict([frame[y1:y2, x1:x2]], imgsz=imgsz)[0]
+        boxes = boxes + np.array([x1, y1, x1, y1], dtype=boxes.dtype)
+        return boxes, clss
+
+    def render_cached(self, frame) -> ParkingResult:
+        """Render the cached per-spot occupancy on `frame` without running the detector."""
+        occupied = ~np.isnan(self.spot_xyxy[:, 0])
+        spot_box = np.full(len(self.layout), -1, dtype=np.int32)
+        spot_box[occupied] = np.arange(int(occupied.sum()), dtype=np.int32)
+        return self.engine.render(frame, spot_box, self.spot_xyxy[occupied], self.spot_cls[occupied])
+
+
+class ParkingRegistry:
+    """Every parking location served by one process, sharing a single YOLO model in memory."""
+
+    def __init__(self, model, layouts: Dict[str, str], conf: float = 0.25, on_frames: int = 2, off_frames: int = 3,
+                 metrics=None):
+        self.model = model
+        self.conf = conf
+        self.metrics = metrics
+        self.engines = {name: ParkingEngine(model, ParkingLayout(path), conf, metrics=metrics)
+                        for name, path in layouts.items()}
+        self.trackers = {name: SpotTracker(len(engine.layout), on_frames, off_frames)
+                         for name, engine in self.engines.items()}
+        # Latest stats per location, same keys as ParkingManagement.pr_info
+        self.pr_info = {name: {} for name in layouts}
+        # record() runs on the inference thread and, for cache hits, on the event loop
+        self._lock = threading.Lock()
+
+    def __contains__(self, location):
+        return location in self.engines
+
+    def names(self):
+        return sorted(self.engines)
+
+    def process(self, requests: List[Tuple[str, np.ndarray]]) -> List[ParkingResult]:
+        """Run (location, image) pairs from any mix of locations through one batched forward pass."""
+        images = [im0 for _, im0 in requests]
+        with stage_timer(self.metrics, "predict"):
+            detections = predict_batch(self.model, images, self.conf)
+        results = []
+        for (location, im0), (boxes, clss) in zip(requests, detections):
+            result = self.engines[location].finish(im0, boxes, clss)
+            self.record(location, result.spot_box >= 0)
+            results.append(result)
+        return results
+
+    def record(self, location: str, spot_occupied: np.ndarray):
+        """Update stats and spot tracker of a location from one frame's per-spot occupancy."""
+        occupied = int(spot_occupied.sum())
+        with self._lock:
+            self.pr_info[location] = {"Occupancy": occupied, "Available": len(spot_occupied) - occupied}
+            self.trackers[location].update(spot_occupied)
+
+    def snapshot(self, location: str):
+        """Per-spot state and dwell times of a location (see SpotTracker.snapshot)."""
+        with self._lock:
+            return self.trackers[location].snapshot()
+
+
+def discover_layouts(layout_dir, prefix="bounding_boxes_"):
+    """Map location name -> layout file for every bounding_boxes_<location>.json in layout_dir."""
+    layouts = {}
+    for path in sorted(glob.glob(os.path.join(layout_dir, f"{prefix}*.json"))):
+        name = os.path.splitext(os.path.basename(path))[0][len(prefix):]
+        layouts[name] = path
+    return layouts
+
+
+def stage_timer(metrics, stage: str):
+    """metrics.timer(stage), or a no-op when no metrics object is attached."""
+    return metrics.timer(stage) if metrics is not None else nullcontext()
+
+
+def predict_batch(model, images: List[np.ndarray], conf: float = 0.25, imgsz: int = None):
+    """One batched forward pass. Returns a list of (boxes xyxy, class ids) per image."""
+    kwargs = {"imgsz": imgsz} if imgsz else {}
+    outputs = []
+    for r in model.predict(images, conf=conf, verbose=False, **kwargs):
+        outputs.append((r.boxes.xyxy.cpu().numpy(), r.boxes.cls.cpu().numpy().astype(np.int32)))
+    return outputs
+
+
+def draw_center_label(im0, text, xc, yc, margin=10):
+    """Label centered on (xc, yc) with a filled background, like SolutionAnnotator.display_objects_labels."""
+    (tw, th), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.4, 1)
+    x, y = xc - tw // 2, yc + th // 2
+    cv2.rectangle(im0, (x - margin, y - th - margin), (x + tw + margin, y + margin), LABEL_BG_COLOR, -1)
+    cv2.putText(im0, text, (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.4, LABEL_TXT_COLOR, 1, cv2.LINE_AA)
+
+
+def draw_analytics(im0, info, margin=10):
+    """Key/value summary in the top-right corner, like SolutionAnnotator.display_analytics."""
+    w = im0.shape[1]
+    y = 0
+    for key, value in info.items():
+        text = f"{key}: {value}"
+        (tw, th), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)
+        x = w - tw - 2 * margin
+        y += th + 2 * margin
+        cv2.rectangle(im0, (x - margin, y - th - margin), (x + tw + margin, y + margin), LABEL_BG_COLOR, -1)
+        cv2.putText(im0, text, (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.7, LABEL_TXT_COLOR, 2, cv2.LINE_AA)
+        y += margin
@@ -4,20 +4,30 @@
  */
 
 class ParkingDetector {
-    constructor(apiBaseUrl = 'http://localhost:8001') {
+    /**
+     * @param {string} apiBaseUrl - Parking API base URL
+     * @param {string|null} location - Location name (e.g. 'location_2'), null for the server default
+     */
+    constructor(apiBaseUrl = 'http://localhost:8001', location = null) {
         this.apiBase = apiBaseUrl;
+        this.location = location;
+    }
+
+    get locationBase() {
+        return this.location ? `${this.apiBase}/api/parking/${this.location}` : `${this.apiBase}/api/parking`;
     }
 
     /**
      * Detect parking from image file
      * @param {File} imageFile - Image file to process
+     * @param {string} responseFormat - 'json' (inline base64 image), 'stats' (no image) or 'reference' (result_url)
      * @returns {Promise<Object>} Detection results
      */
-    async detectParking(imageFile) {
+    async detectParking(imageFile, responseFormat = 'json') {
         const formData = new FormData();
         formData.append('file', imageFile);
 
-        const response = await fetch(`${this.apiBase}/api/parking/detect`, {
+        const response = await fetch(`${this.locationBase}/detect?response_format=${responseFormat}`, {
             method: 'POST',
             body: formData
         });
@@ -47,8 +57,17 @@ class ParkingDetector {
         return `${this.apiBase}/api/parking/result/${filename}`;
     }
 
+    /**
+     * List locations served by the API
+     * @returns {Promise<Object>} { locations: [...] }
+     */
+    async getLocations() {
+        const response = await fetch(`${this.apiBase}/api/parking/locations`);
+        return await response.json();
+    }
+
     async getStats() {
-        const response = await fetch(`${this.apiBase}/api/parking/stats`);
+        const response = await fetch(`${this.locationBase}/stats`);
         return await response.json();
     }
 }
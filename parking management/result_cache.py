@@ -0,0 +1,75 @@
+"""
+Result Cache - Bounded LRU of per-upload results, shared by the parking API and the LPR app
+- Keyed by a hash of the uploaded bytes plus whatever versions change the result (model, layout, config).
+- Evicts oldest-first by total size and entry count; hit/miss/eviction counters for status endpoints.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+class ResultCache:
+    """Bounded LRU of results keyed by a hash of the uploaded bytes (plus model/layout or config versions).
+
+    Entries are evicted oldest-first once their total size exceeds `max_bytes`
+    or there are more than `max_entries` of them.
+    """
+
+    def __init__(self, max_bytes: int, max_entries: int = 1024):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(content: bytes, *versions) -> str:
+        h = hashlib.blake2b(content, digest_size=16)
+        for version in versions:
+            h.update(str(version).encode())
+        return h.hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size: int):
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self._entries:
+                self._size -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._size += size
+            while self._size > self.max_bytes or len(self._entries) > self.max_entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+def file_version(path):
+    """Path plus modification time, so replacing the weights invalidates cached results."""
+    return f"{path}:{os.path.getmtime(path) if os.path.exists(path) else 0}"
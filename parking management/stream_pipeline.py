@@ -0,0 +1,240 @@
+"""
+Stream Pipeline - Hand-off between capture, inference and render stages
+- Each stage runs at its own pace; slow consumers skip to the newest item.
+- Drop counters show how many frames a stage never got to see.
+- Motion gate skips inference when a static camera sees nothing new.
+- Artifact writer encodes and saves result images off the request/inference path.
+"""
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+class LatestQueue:
+    """Bounded latest-wins queue between two pipeline stages.
+
+    put() never blocks: when the queue is full the oldest item is discarded and
+    counted in `dropped`, so the consumer always works on the most recent frames.
+    """
+
+    def __init__(self, maxsize: int = 1):
+        self._items = deque(maxlen=max(1, maxsize))
+        self._cond = threading.Condition()
+        self.put_count = 0
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(item)
+            self.put_count += 1
+            self._cond.notify()
+
+    def get(self, timeout: float = None):
+        """Oldest queued item, waiting up to `timeout` seconds. Returns None if nothing arrived."""
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None
+            return self._items.popleft()
+
+    def clear(self):
+        with self._cond:
+            self._items.clear()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+
+class MotionGate:
+    """Decides whether a frame is worth running YOLO on.
+
+    Each frame is shrunk to `width` pixels wide, grayscaled and blurred, then compared
+    with the frame used for the last inference. If fewer than `min_changed` of its pixels
+    moved by more than `pixel_threshold`, the caller should reuse its last result.
+    Inference is still forced every `refresh_interval` seconds so lighting drift and
+    slow changes are picked up; `last_forced` tells the caller the last run was such a
+    refresh, so it can do a full pass instead of reusing cached results.
+    """
+
+    def __init__(self, width: int = 160, pixel_threshold: int = 25, min_changed: float = 0.002,
+                 refresh_interval: float = 10.0):
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed = min_changed
+        self.refresh_interval = refresh_interval
+        self.reference = None
+        self.last_run = 0.0
+        self.processed = 0
+        self.skipped = 0
+        self.forced = 0
+        self.last_forced = False
+
+    def _signature(self, frame):
+        h, w = frame.shape[:2]
+        small = cv2.resize(frame, (self.width, max(1, int(h * self.width / w))), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def should_process(self, frame, now: float = None) -> bool:
+        now = time.time() if now is None else now
+        signature = self._signature(frame)
+        self.last_forced = False
+
+        if self.reference is None or self.reference.shape != signature.shape:
+            run = True
+        elif now - self.last_run >= self.refresh_interval:
+            run = True
+            self.forced += 1
+            self.last_forced = True
+        else:
+            changed = np.count_nonzero(cv2.absdiff(signature, self.reference) > self.pixel_threshold)
+            run = bool(changed >= self.min_changed * signature.size)
+
+        if run:
+            self.reference = signature
+            self.last_run = now
+            self.processed += 1
+        else:
+            self.skipped += 1
+        return run
+
+    def reset(self):
+        self.reference = None
+
+
+class ArtifactWriter:
+    """Background JPEG encoder/writer with a bounded queue.
+
+    submit() takes an already computed image (BGR/gray array or encoded bytes) and returns
+    at once; worker threads encode and write it. When the queue is full the `policy` decides:
+    - drop_oldest: discard the oldest queued artifact to make room (default)
+    - drop_newest: discard the artifact being submitted
+    - block:       wait for room (backpressure on the producer)
+    on_done(jpeg) is called from the worker once the file is written, or with None if the
+    artifact was dropped or failed. With path=None the image is only encoded (on_done still runs).
+    """
+
+    POLICIES = ("drop_oldest", "drop_newest", "block")
+
+    def __init__(self, max_queue: int = 64, policy: str = "drop_oldest", workers: int = 1, quality: int = 95):
+        if policy not in self.POLICIES:
+            raise ValueError(f"policy must be one of {', '.join(self.POLICIES)}")
+        self.max_queue = max(1, max_queue)
+        self.policy = policy
+        self.quality = quality
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._busy = 0
+        self._closed = False
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.blocked = 0
+        self._threads = [threading.Thread(target=self._run, daemon=True) for _ in range(max(1, workers))]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, path, image, on_done=None, policy: str = None) -> bool:
+        """Queue one artifact. Returns False if it was dropped."""
+        policy = policy or self.policy
+        accepted, victim = True, None
+        with self._cond:
+            self.submitted += 1
+            if len(self._items) >= self.max_queue:
+                if policy == "drop_newest":
+                    accepted, victim = False, (path, image, on_done)
+                    self.dropped += 1
+                elif policy == "drop_oldest":
+                    victim = self._items.popleft()
+                    self.dropped += 1
+                else:
+                    self.blocked += 1
+                    while len(self._items) >= self.max_queue and not self._closed:
+                        self._cond.wait()
+            if accepted:
+                self._items.append((path, image, on_done))
+                self._cond.notify_all()
+
+        if victim is not None and victim[2] is not None:
+            victim[2](None)
+        return accepted
+
+    def _encode(self, image):
+        if isinstance(image, (bytes, bytearray)):
+            return bytes(image)
+        ret, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ret:
+            raise RuntimeError("JPEG encoding failed")
+        return buffer.tobytes()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._items and not self._closed:
+                    self._cond.wait()
+                if not self._items:
+                    return
+                path, image, on_done = self._items.popleft()
+                self._busy += 1
+                self._cond.notify_all()
+
+            jpeg = None
+            try:
+                jpeg = self._encode(image)
+                if path is not None:
+                    with open(path, 'wb') as f:
+                        f.write(jpeg)
+                self.written += 1
+            except Exception as e:
+                jpeg = None
+                self.failed += 1
+                print(f"⚠️ Failed to write {path}: {e}")
+            finally:
+                with self._cond:
+                    self._busy -= 1
+                    self._cond.notify_all()
+
+            if on_done is not None:
+                try:
+                    on_done(jpeg)
+                except Exception as e:
+                    print(f"⚠️ Artifact callback failed for {path}: {e}")
+
+    def flush(self, timeout: float = None) -> bool:
+        """Wait until everything queued so far is written. Returns False on timeout."""
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while self._items or self._busy:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 5.0):
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "policy": self.policy,
+                "queued": len(self._items),
+                "max_queue": self.max_queue,
+                "submitted": self.submitted,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "blocked": self.blocked,
+            }